@@ -0,0 +1,244 @@
+# batch.py
+#
+# Render many conversations in one warm pool of processes.  Each process
+# imports the pipeline once and keeps its fonts, asset tiles, thumbnails and
+# emoji across jobs, so only the first job on a process pays to load them.
+
+import argparse, os, sys, json, glob, time, shutil, traceback, datetime
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+# ——— Jobs ——————————————————————————————————————————————————————————————
+#
+# A job is a dict with 'config', 'conversation' and 'characters' paths and
+# optionally a 'name' and an 'output' directory (default output/batch/<name>).
+# Each job renders into its own output directory, so jobs never share frames.
+
+def load_manifest(path):
+    """
+    Jobs from a JSON array or a JSON Lines file.
+    """
+    with open(path, encoding='utf8') as f:
+        if path.endswith('.jsonl'):
+            return [json.loads(line) for line in f if line.strip()]
+        return json.load(f)
+
+def name_jobs(jobs, output_root):
+    """
+    Give every job a unique 'name' and an 'output' directory.
+    """
+    seen = {}
+    for job in jobs:
+        base = job.get('name') or os.path.splitext(os.path.basename(job['conversation']))[0]
+        n = seen[base] = seen.get(base, 0) + 1
+        job['name'] = base if n == 1 else f"{base}-{n}"
+        job.setdefault('output', os.path.join(output_root, job['name']))
+    return jobs
+
+def job_config(job):
+    """
+    The job's config with every output path moved into its output directory.
+    """
+    from scripts.compile_images import load_config
+    cfg = load_config(job['config'])
+    out = job['output']
+    cfg['paths']['chat_output'] = os.path.join(out, 'chat')
+    cfg['paths']['ffmpeg_output'] = os.path.join(out, 'silent_video.mp4')
+    cfg['paths']['final_video'] = os.path.join(out, 'final_video.mp4')
+    return cfg
+
+# ——— Worker side ———————————————————————————————————————————————————————
+
+def _warm_up():
+    # import the whole pipeline once per process, not once per job
+    from scripts import script_validator, generate_chat, compile_images, sound_effects  # noqa: F401
+
+def run_job(job, threads=None, audio_backend='moviepy'):
+    """
+    Validate, render, compile and mix one job.  Returns its status dict
+    (also written to <output>/status.json): 'status' is 'ok', 'invalid' or
+    'failed', 'stages' holds seconds per stage.
+    """
+    from scripts.script_validator import validate, reset_caches
+    from scripts.generate_chat import save_images
+    from scripts.compile_images import compile_video
+    from scripts.sound_effects import add_sounds_and_themes
+    from scripts.conversation import load_conversation
+
+    status = {'name': job['name'], 'job': job, 'pid': os.getpid(), 'status': 'failed',
+              'started': datetime.datetime.now().isoformat(timespec='seconds'), 'stages': {}}
+    t0 = time.perf_counter()
+    stage_start = t0
+
+    def done(stage):
+        nonlocal stage_start
+        now = time.perf_counter()
+        status['stages'][stage] = round(now - stage_start, 3)
+        stage_start = now
+
+    try:
+        # the process outlives this job; assets may have changed since the last one
+        reset_caches()
+        os.makedirs(job['output'], exist_ok=True)
+        cfg = job_config(job)
+        convo = load_conversation(job['conversation'])
+        with open(job['characters'], encoding='utf8') as f:
+            chars = json.load(f)
+
+        errs = validate(convo, cfg)
+        done('validate')
+        if errs:
+            status['status'] = 'invalid'
+            status['errors'] = errs
+        else:
+            save_images(cfg, convo, chars)
+            done('render')
+            # ffmpeg would stop to ask before overwriting a previous run's video
+            for path in (cfg['paths']['ffmpeg_output'], cfg['paths']['final_video']):
+                if os.path.exists(path):
+                    os.remove(path)
+            compile_video(cfg, convo, threads=threads)
+            done('compile')
+            add_sounds_and_themes(cfg, convo, cfg['paths']['ffmpeg_output'], cfg['paths']['final_video'],
+                                  backend=audio_backend)
+            done('mix')
+            if cfg.get('video_settings', {}).get('cleanup_temp_files', True):
+                shutil.rmtree(cfg['paths']['chat_output'], ignore_errors=True)
+            status['status'] = 'ok'
+            status['video'] = cfg['paths']['final_video']
+    except Exception as e:
+        status['error'] = f"{type(e).__name__}: {e}"
+        status['traceback'] = traceback.format_exc()
+
+    status['seconds'] = round(time.perf_counter() - t0, 3)
+    try:
+        with open(os.path.join(job['output'], 'status.json'), 'w', encoding='utf8') as f:
+            json.dump(status, f, indent=2)
+    except OSError:
+        pass
+    return status
+
+# ——— Scheduling ————————————————————————————————————————————————————————
+
+def report(status):
+    if status['status'] == 'ok':
+        print(f"✅ {status['name']}: done in {status['seconds']:.1f}s -> {status['video']}")
+    elif status['status'] == 'invalid':
+        print(f"❌ {status['name']}: {len(status['errors'])} validation errors (see status.json)")
+    else:
+        print(f"❌ {status['name']}: {status.get('error')}")
+
+def queue_jobs(queue_dir, output_root, taken):
+    """
+    New job files in `queue_dir` (one job object per *.json file), i.e.
+    those not in `taken`, the set of files queued and not yet finished.
+    Returns (jobs, statuses of files that could not be read); unreadable
+    files are moved to failed/ straight away.
+    """
+    jobs = []
+    rejected = []
+    for path in sorted(glob.glob(os.path.join(queue_dir, '*.json'))):
+        if path in taken:
+            continue
+        taken.add(path)
+        name = os.path.splitext(os.path.basename(path))[0]
+        try:
+            with open(path, encoding='utf8') as f:
+                job = json.load(f)
+            if not isinstance(job, dict):
+                raise ValueError("expected a JSON object")
+        except (OSError, ValueError) as e:
+            # JSONDecodeError is a ValueError
+            status = {'name': name, 'job': {'queue_file': path}, 'status': 'failed',
+                      'error': f"{type(e).__name__}: {e}", 'stages': {}, 'seconds': 0}
+            report(status)
+            try:
+                finish_queue_file(status, taken)
+            except OSError:
+                taken.discard(path)  # vanished while we read it
+            rejected.append(status)
+            continue
+        job.setdefault('name', name)
+        job['queue_file'] = path
+        jobs.append(job)
+    return name_jobs(jobs, output_root), rejected
+
+def finish_queue_file(status, taken=None):
+    """
+    Move a finished queue file to done/ or failed/ with its status beside it,
+    then drop it from `taken` so a new file of the same name is queued.
+    """
+    path = status['job'].get('queue_file')
+    if not path:
+        return
+    folder = os.path.join(os.path.dirname(path), 'done' if status['status'] == 'ok' else 'failed')
+    os.makedirs(folder, exist_ok=True)
+    name = os.path.basename(path)
+    os.replace(path, os.path.join(folder, name))
+    with open(os.path.join(folder, f"{os.path.splitext(name)[0]}.status.json"), 'w', encoding='utf8') as f:
+        json.dump(status, f, indent=2)
+    if taken is not None:
+        taken.discard(path)
+
+def run_batch(jobs, concurrency, threads, audio_backend, queue_dir=None, output_root=None, poll=0):
+    """
+    Run `jobs` (and, with `queue_dir`, whatever appears there) on a pool of
+    `concurrency` warm processes.  Returns the list of status dicts.
+    """
+    results = []
+    taken = set()
+    with ProcessPoolExecutor(max_workers=concurrency, initializer=_warm_up) as pool:
+        pending = {pool.submit(run_job, job, threads, audio_backend) for job in jobs}
+        while True:
+            if queue_dir:
+                jobs, rejected = queue_jobs(queue_dir, output_root, taken)
+                results.extend(rejected)
+                for job in jobs:
+                    pending.add(pool.submit(run_job, job, threads, audio_backend))
+            if not pending:
+                if queue_dir and poll:
+                    time.sleep(poll)
+                    continue
+                break
+            finished, pending = wait(pending, timeout=poll or None, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                status = fut.result()
+                report(status)
+                finish_queue_file(status, taken)
+                results.append(status)
+    return results
+
+def main():
+    p = argparse.ArgumentParser(description='Render many conversations in one warm process pool')
+    src = p.add_mutually_exclusive_group(required=True)
+    src.add_argument('--manifest', help='JSON array or .jsonl of {config, conversation, characters[, name, output]} jobs')
+    src.add_argument('--queue',    metavar='DIR', help='directory of job .json files; finished files move to done/ or failed/')
+    p.add_argument('--poll',       type=float, default=0,
+                   help='with --queue, keep watching DIR every POLL seconds instead of exiting when it is empty')
+    p.add_argument('--output',     default='output/batch', help='root of the per-job output directories')
+    p.add_argument('--cpus',       type=int, default=os.cpu_count() or 1, help='CPU budget for the whole batch')
+    p.add_argument('--jobs',       type=int, default=None,
+                   help='conversations rendered at once (default: the CPU budget)')
+    p.add_argument('--audio-backend', choices=('moviepy', 'ffmpeg', 'numpy'), default='moviepy')
+    args = p.parse_args()
+
+    concurrency = max(1, min(args.jobs or args.cpus, args.cpus))
+    # ffmpeg threads per job so concurrent encodes stay within the budget
+    threads = max(1, args.cpus // concurrency)
+
+    jobs = name_jobs(load_manifest(args.manifest), args.output) if args.manifest else []
+    t0 = time.perf_counter()
+    results = run_batch(jobs, concurrency, threads, args.audio_backend,
+                        queue_dir=args.queue, output_root=args.output, poll=args.poll)
+
+    os.makedirs(args.output, exist_ok=True)
+    summary = os.path.join(args.output, 'batch.json')
+    with open(summary, 'w', encoding='utf8') as f:
+        json.dump({'seconds': round(time.perf_counter() - t0, 3), 'cpus': args.cpus,
+                   'concurrency': concurrency, 'jobs': results}, f, indent=2)
+    ok = sum(r['status'] == 'ok' for r in results)
+    print(f"✅ {ok}/{len(results)} jobs succeeded; summary in {summary}")
+    if ok != len(results):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
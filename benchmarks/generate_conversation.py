@@ -0,0 +1,101 @@
+# benchmarks/generate_conversation.py
+
+import os, sys, json, random, argparse
+
+WORDS = (
+    "the quick brown fox jumps over lazy dog chat server video render frame "
+    "message pizza beluga discord hello everyone what is going on here today "
+    "really think maybe tomorrow never always later soon again okay sure"
+).split()
+EMOJI = ["🎉", "😎", "🔥", "💯", "⚡", "🚀", "🤖", "✨", "😂", "👀"]
+MARKDOWN = ["**{}**", "*{}*", "***{}***", "~~{}~~"]
+ATTACHMENTS = ["assets/green_arrow.png", "assets/red_arrow.png"]
+
+def usable_cast(cfg, chars):
+    """
+    Characters whose profile picture exists, so every frame can render.
+    """
+    pics = cfg['paths']['profile_pics']
+    return [n for n, c in chars.items() if os.path.isfile(os.path.join(pics, c['profile_pic']))]
+
+def make_text(rng, cast, words, markdown, emoji, mention):
+    out = []
+    for _ in range(max(1, int(rng.expovariate(1 / words)) + 1)):
+        roll = rng.random()
+        if roll < mention:
+            out.append(f"@{rng.choice(cast)}")
+        elif roll < mention + emoji:
+            out.append(rng.choice(EMOJI))
+        elif roll < mention + emoji + markdown:
+            out.append(rng.choice(MARKDOWN).format(rng.choice(WORDS)))
+        else:
+            out.append(rng.choice(WORDS))
+    return " ".join(out)
+
+def generate(cfg, chars, events=200, words=12, markdown=0.1, emoji=0.05, mention=0.03,
+             run_length=3, attachments=0.05, seed=0):
+    """
+    Build a synthetic conversation from the usable cast.  Densities are
+    per-word probabilities; `run_length` is the mean number of messages a
+    speaker sends in a row and `attachments` the share of messages with an
+    image attached.
+    """
+    rng = random.Random(seed)
+    cast = usable_cast(cfg, chars)
+    if not cast:
+        raise SystemExit("No characters with existing profile pictures")
+
+    convo = [{"type": "join", "actor": a, "duration": 1.0, "sound": "join"} for a in cast]
+    while len(convo) < events:
+        actor = rng.choice(cast)
+        convo.append({"type": "typing", "actor": actor, "duration": 1.0, "sound": "typing"})
+        for _ in range(max(1, round(rng.expovariate(1 / run_length)))):
+            ev = {
+                "type": "message",
+                "actor": actor,
+                "text": make_text(rng, cast, words, markdown, emoji, mention),
+                "duration": round(rng.uniform(1.0, 4.0), 2),
+                "sound": "message",
+            }
+            if rng.random() < attachments:
+                path = rng.choice(ATTACHMENTS)
+                ev["attachments"] = [{"type": "image", "path": path, "filename": os.path.basename(path)}]
+            convo.append(ev)
+    convo = convo[:max(events - 1, len(cast))]
+    convo.append({"type": "leave", "actor": convo[-1]["actor"], "duration": 1.0, "sound": "leave"})
+    return convo
+
+def add_arguments(p):
+    p.add_argument('--events',      type=int,   default=200)
+    p.add_argument('--words',       type=float, default=12, help='mean words per message')
+    p.add_argument('--markdown',    type=float, default=0.1, help='share of styled words')
+    p.add_argument('--emoji',       type=float, default=0.05, help='share of emoji words')
+    p.add_argument('--mention',     type=float, default=0.03, help='share of @mentions')
+    p.add_argument('--run-length',  type=float, default=3, help='mean same-actor run length')
+    p.add_argument('--attachments', type=float, default=0.05, help='share of messages with an image')
+    p.add_argument('--seed',        type=int,   default=0)
+
+def generate_from_args(cfg, chars, args):
+    return generate(cfg, chars, events=args.events, words=args.words, markdown=args.markdown,
+                    emoji=args.emoji, mention=args.mention, run_length=args.run_length,
+                    attachments=args.attachments, seed=args.seed)
+
+def main():
+    p = argparse.ArgumentParser(description='Write a synthetic conversation.json')
+    p.add_argument('output')
+    p.add_argument('--config',     default='utils/config.json')
+    p.add_argument('--characters', default='utils/characters.json')
+    add_arguments(p)
+    args = p.parse_args()
+
+    with open(args.config, encoding='utf8') as f:
+        cfg = json.load(f)
+    with open(args.characters, encoding='utf8') as f:
+        chars = json.load(f)
+    convo = generate_from_args(cfg, chars, args)
+    with open(args.output, 'w', encoding='utf8') as f:
+        json.dump(convo, f, indent=2, ensure_ascii=False)
+    print(f"Wrote {len(convo)} events to {args.output}")
+
+if __name__ == '__main__':
+    main()
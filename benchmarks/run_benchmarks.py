@@ -0,0 +1,158 @@
+# benchmarks/run_benchmarks.py
+
+import os, sys, json, time, shutil, argparse, platform, tempfile, datetime, subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generate_conversation import add_arguments, generate_from_args
+
+STAGES = ('startup', 'validate', 'render', 'compile', 'mix')
+
+# Fresh interpreters timed for the startup stage; the fastest run is kept
+STARTUP_RUNS = 3
+
+def bench_startup(cfg, convo, chars, result):
+    # a validate-only main.py run in a new interpreter: import cost plus validation
+    work = os.path.dirname(cfg['paths']['final_video'])
+    paths = {}
+    for name, data in (('config', cfg), ('conversation', convo), ('characters', chars)):
+        paths[name] = os.path.join(work, f"{name}.json")
+        with open(paths[name], 'w', encoding='utf8') as f:
+            json.dump(data, f)
+    cmd = [sys.executable, os.path.join(ROOT, 'main.py'), '--stage', 'validate',
+           '--config', paths['config'], '--conversation', paths['conversation'],
+           '--characters', paths['characters']]
+    runs = []
+    for _ in range(STARTUP_RUNS):
+        t = time.perf_counter()
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+        runs.append(time.perf_counter() - t)
+    result['stages']['startup'] = min(runs)
+
+def bench_validate(cfg, convo, chars, result):
+    from scripts.script_validator import validate
+    t = time.perf_counter()
+    errs = validate(convo, cfg)
+    result['stages']['validate'] = time.perf_counter() - t
+    if errs:
+        raise SystemExit("Synthetic conversation failed validation:\n - " + "\n - ".join(errs))
+
+def bench_render(cfg, convo, chars, result, deltas=False):
+    # the jobs and worker function save_images uses (layout plan, frame cache,
+    # delta tagging); per-type times include planning the frame, which runs
+    # lazily as each job is pulled
+    from scripts import generate_chat
+    os.makedirs(cfg['paths']['chat_output'], exist_ok=True)
+    by_type = {}
+    stats = {'hits': 0, 'misses': 0}
+    t = time.perf_counter()
+    jobs = generate_chat.plan_jobs(cfg, convo, chars, stats, deltas)
+    s = time.perf_counter()
+    for job, _ in generate_chat.map_jobs(generate_chat._render_job, jobs, cfg, chars):
+        now = time.perf_counter()
+        entry = by_type.setdefault(job['type'], {'count': 0, 'seconds': 0.0})
+        entry['count'] += 1
+        entry['seconds'] += now - s
+        s = now
+    result['stages']['render'] = time.perf_counter() - t
+    result['render_by_type'] = by_type
+
+def bench_compile(cfg, convo, chars, result):
+    from scripts.compile_images import compile_video
+    t = time.perf_counter()
+    compile_video(cfg, convo)
+    result['stages']['compile'] = time.perf_counter() - t
+
+def bench_mix(cfg, convo, chars, result, backend='moviepy'):
+    from scripts.sound_effects import add_sounds_and_themes
+    t = time.perf_counter()
+    add_sounds_and_themes(cfg, convo, cfg['paths']['ffmpeg_output'], cfg['paths']['final_video'], backend=backend)
+    result['stages']['mix'] = time.perf_counter() - t
+
+BENCHES = {'startup': bench_startup, 'validate': bench_validate, 'render': bench_render, 'compile': bench_compile}
+
+def compare(result, baseline, tolerance, min_seconds=0.05):
+    """
+    Return regression messages for stages slower than baseline × (1 + tolerance).
+    Stages faster than `min_seconds` in the baseline are too noisy to judge.
+    """
+    problems = []
+    for stage, seconds in result['stages'].items():
+        old = baseline.get('stages', {}).get(stage)
+        if old and old >= min_seconds and seconds > old * (1 + tolerance):
+            problems.append(f"{stage}: {seconds:.3f}s vs baseline {old:.3f}s (+{(seconds / old - 1) * 100:.0f}%)")
+    return problems
+
+def main():
+    p = argparse.ArgumentParser(description='Time each pipeline stage on a synthetic conversation')
+    p.add_argument('--config',     default=os.path.join(ROOT, 'utils/config.json'))
+    p.add_argument('--characters', default=os.path.join(ROOT, 'utils/characters.json'))
+    p.add_argument('--stages',     default=','.join(STAGES), help=f"comma-separated subset of {STAGES}")
+    p.add_argument('--audio-backend', choices=('moviepy', 'ffmpeg', 'numpy'), default='moviepy')
+    p.add_argument('--deltas',     action='store_true', help='render as main.py --deltas does')
+    p.add_argument('--output',     default=None, help='write results JSON here')
+    p.add_argument('--baseline',   default=None, help='results JSON to compare against')
+    p.add_argument('--tolerance',  type=float, default=0.2, help='allowed slowdown vs baseline (0.2 = 20%%)')
+    p.add_argument('--min-seconds', type=float, default=0.05, help='ignore baseline stages shorter than this')
+    add_arguments(p)
+    args = p.parse_args()
+
+    stages = [s for s in args.stages.split(',') if s]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        p.error(f"unknown stages: {sorted(unknown)}")
+
+    os.chdir(ROOT)
+    with open(args.config, encoding='utf8') as f:
+        cfg = json.load(f)
+    with open(args.characters, encoding='utf8') as f:
+        chars = json.load(f)
+    convo = generate_from_args(cfg, chars, args)
+
+    work = tempfile.mkdtemp(prefix='t2b-bench-')
+    cfg['paths']['chat_output'] = os.path.join(work, 'chat')
+    cfg['paths']['ffmpeg_output'] = os.path.join(work, 'chat', 'output.mp4')
+    cfg['paths']['final_video'] = os.path.join(work, 'final.mp4')
+
+    result = {
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': {k: v for k, v in vars(args).items()
+                   if k not in ('config', 'characters', 'output', 'baseline', 'tolerance', 'min_seconds')},
+        'events': len(convo),
+        'stages': {},
+    }
+    try:
+        for stage in STAGES:
+            if stage not in stages:
+                continue
+            if stage == 'mix':
+                bench_mix(cfg, convo, chars, result, args.audio_backend)
+            elif stage == 'render':
+                bench_render(cfg, convo, chars, result, args.deltas)
+            else:
+                BENCHES[stage](cfg, convo, chars, result)
+            print(f"{stage:>9}: {result['stages'][stage]:.3f}s")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    for kind, entry in sorted(result.get('render_by_type', {}).items()):
+        print(f"   {kind:>7}: {entry['count']} frames, {entry['seconds'] / entry['count'] * 1000:.1f} ms/frame")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf8') as f:
+            json.dump(result, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf8') as f:
+            problems = compare(result, json.load(f), args.tolerance, args.min_seconds)
+        if problems:
+            print("Regressions:", *problems, sep="\n - ")
+            sys.exit(1)
+        print("No regressions.")
+
+if __name__ == '__main__':
+    main()
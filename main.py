@@ -1,45 +1,75 @@
 # main.py
 
-import argparse, sys, json
+import argparse, os, sys, json
 from scripts.script_validator import load_config, validate
-from scripts.generate_chat    import save_images
-from scripts.compile_images   import compile_video
-from scripts.sound_effects    import main as sound_main
+from scripts                  import profiling
+from scripts.conversation     import load_conversation
+# Rendering (PIL, pilmoji), compiling and mixing (moviepy, numpy) are imported
+# inside the stage that needs them, so validate-only runs start fast.
 
-def main():
-    p = argparse.ArgumentParser()
-    p.add_argument('--config',       default='utils/config.json')
-    p.add_argument('--conversation', default='utils/conversation.json')
-    p.add_argument('--characters',   default='utils/characters.json')
-    args = p.parse_args()
+STAGES = ('validate', 'render', 'compile', 'mix')
 
-    cfg   = load_config(args.config)
-    with open(args.conversation, encoding='utf8') as f:
-        convo = json.load(f)
+def run_video_stages(args, cfg, convo, stages):
+    with open(args.characters, encoding='utf8') as f:
+        chars = json.load(f)
+    if args.stream:
+        from scripts.generate_chat  import iter_frames
+        from scripts.compile_images import stream_video
+        save_dir = cfg['paths']['chat_output'] if args.keep_frames else None
+        with profiling.stage('render+compile'):
+            stream_video(cfg, iter_frames(cfg, convo, chars, workers=args.workers, save_dir=save_dir))
+        return
+    if 'render' in stages:
+        from scripts.generate_chat import save_images
+        with profiling.stage('render'):
+            save_images(cfg, convo, chars, workers=args.workers, deltas=args.deltas)
+    if 'compile' in stages:
+        from scripts.compile_images import compile_video
+        with profiling.stage('compile'):
+            compile_video(cfg, convo, workers=args.encode_workers, threads=args.encode_threads)
 
-    errs = validate(convo, cfg)
-    if errs:
-        print("Validation failed:", *errs, sep="\n - ")
+def run_verify(args, cfg, convo):
+    from scripts.generate_chat import verify_deltas
+    with open(args.characters, encoding='utf8') as f:
+        chars = json.load(f)
+    with profiling.stage('verify'):
+        bad = verify_deltas(cfg, convo, chars)
+    if bad:
         sys.exit(1)
 
+def run_pipelined(args, cfg, convo):
+    from scripts.pipeline import run_pipeline
     with open(args.characters, encoding='utf8') as f:
         chars = json.load(f)
-    save_images(cfg, convo, chars)
-    compile_video(cfg, convo)
+    backend = args.audio_backend
+    if backend == 'moviepy':
+        # moviepy can only mix into a finished video
+        print("ℹ️  --pipeline mixes audio with the numpy backend")
+        backend = 'numpy'
+    save_dir = cfg['paths']['chat_output'] if args.keep_frames else None
+    run_pipeline(cfg, convo, chars, workers=args.workers, audio_backend=backend, save_dir=save_dir)
+    cleanup(cfg)
+
+def run_mix(args, cfg):
+    from scripts.sound_effects import main as sound_main
 
     # mix in sounds
     sound_main_args = [
       '--config',       args.config,
       '--conversation', args.conversation,
       '--input-video',  cfg['paths']['ffmpeg_output'],
-      '--output-video', cfg['paths']['final_video']
+      '--output-video', cfg['paths']['final_video'],
+      '--backend',      args.audio_backend
     ]
     # Call sound_main with the prepared arguments
     original_argv = sys.argv
     sys.argv = ['sound_effects.py'] + sound_main_args
-    sound_main()
+    with profiling.stage('mix'):
+        sound_main()
     sys.argv = original_argv
+    cleanup(cfg)
 
+def cleanup(cfg):
     # Clean up temporary files after final video creation (if enabled)
     if cfg.get('video_settings', {}).get('cleanup_temp_files', True):
         chat_folder = cfg['paths']['chat_output']
@@ -55,7 +85,75 @@ def main():
     else:
         print("ℹ️  Cleanup disabled - temporary chat images preserved")
 
-    print("✅ All done! Final video at", cfg['paths']['final_video'])
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--config',       default='utils/config.json')
+    p.add_argument('--conversation', default='utils/conversation.json')
+    p.add_argument('--characters',   default='utils/characters.json')
+    p.add_argument('--workers',      type=int, default=1,
+                   help='number of processes used to render frames')
+    p.add_argument('--probe',        action='store_true',
+                   help='decode image attachments while validating (uses --workers threads)')
+    p.add_argument('--pipeline',     action='store_true',
+                   help='stream frames into ffmpeg and mix audio at the same time, then mux')
+    p.add_argument('--stream',       action='store_true',
+                   help='pipe frames straight into ffmpeg instead of writing PNGs')
+    p.add_argument('--keep-frames',  action='store_true',
+                   help='with --stream, also write the NNN.png frames')
+    p.add_argument('--deltas',       action='store_true',
+                   help='write frames that repeat most of the previous one as tiles of their changed area')
+    p.add_argument('--verify-deltas', action='store_true',
+                   help='check every frame rebuilt from its changed area against a full render, then exit')
+    p.add_argument('--encode-workers', type=int, default=1,
+                   help='number of ffmpeg processes encoding video ranges in parallel')
+    p.add_argument('--encode-threads', type=int, default=None,
+                   help='encoder threads per ffmpeg process')
+    p.add_argument('--audio-backend', choices=('moviepy', 'ffmpeg', 'numpy'), default='moviepy',
+                   help="'ffmpeg' and 'numpy' mix audio without re-encoding the video")
+    p.add_argument('--profile',      nargs='?', const='output/profile', default=None, metavar='DIR',
+                   help='record stage and frame timings into DIR (default output/profile)')
+    p.add_argument('--stage',        action='append', choices=STAGES, default=None,
+                   help='run only this stage (repeatable); later stages read what earlier runs left on disk')
+    args = p.parse_args()
+    stages = set(args.stage or STAGES)
+    if args.stream and len(stages & {'render', 'compile'}) == 1:
+        p.error("--stream renders and compiles in one pass; select both stages or neither")
+    if args.pipeline and not {'render', 'compile', 'mix'} <= stages:
+        p.error("--pipeline overlaps render, compile and mix; select all of them")
+    if args.profile:
+        profiling.enable()
+
+    cfg   = load_config(args.config)
+    convo = load_conversation(args.conversation)
+
+    if 'validate' in stages:
+        with profiling.stage('validate'):
+            errs = validate(convo, cfg, probe=args.probe, workers=args.workers)
+        if errs:
+            print("Validation failed:", *errs, sep="\n - ")
+            sys.exit(1)
+
+    if args.verify_deltas:
+        run_verify(args, cfg, convo)
+        if args.profile:
+            profiling.write(args.profile)
+        return
+
+    if args.pipeline:
+        run_pipelined(args, cfg, convo)
+    else:
+        if 'render' in stages or 'compile' in stages:
+            run_video_stages(args, cfg, convo, stages)
+        if 'mix' in stages:
+            run_mix(args, cfg)
+
+    if args.profile:
+        profiling.write(args.profile)
+
+    if 'mix' in stages:
+        print("✅ All done! Final video at", cfg['paths']['final_video'])
+    else:
+        print("✅ Done:", ", ".join(s for s in STAGES if s in stages))
 
 if __name__=='__main__':
     main()
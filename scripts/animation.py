@@ -0,0 +1,74 @@
+# scripts/animation.py
+#
+# Animated GIF attachments.  Message blocks are rendered once with each GIF's
+# first frame; when the video is composed only the GIF's rectangle is redrawn
+# as it advances, so no extra PNGs are needed.  An "overlay" is a dict with
+# the GIF's 'path' and its 'x', 'y', 'w', 'h' rectangle in frame coordinates.
+
+import os, functools
+
+from PIL import Image, ImageSequence
+
+# Upper bound on GIFs kept decoded at once
+GIF_CACHE_SIZE = 32
+
+# Delay used for GIF frames that do not specify one (browsers do the same)
+DEFAULT_DELAY = 0.1
+
+@functools.lru_cache(maxsize=1024)
+def _is_animated(path, mtime):
+    try:
+        with Image.open(path) as img:
+            return img.format == 'GIF' and getattr(img, 'is_animated', False)
+    except Exception:
+        return False
+
+def is_animated(path):
+    """
+    True for GIFs with more than one frame.
+    """
+    try:
+        return _is_animated(os.path.abspath(path), os.path.getmtime(path))
+    except OSError:
+        return False
+
+@functools.lru_cache(maxsize=GIF_CACHE_SIZE)
+def _gif_frames(path, mtime, w, h):
+    frames = []
+    with Image.open(path) as img:
+        for frame in ImageSequence.Iterator(img):
+            delay = frame.info.get('duration', 0) / 1000 or DEFAULT_DELAY
+            frames.append((frame.convert('RGBA').resize((w, h), Image.LANCZOS), delay))
+    return tuple(frames)
+
+def gif_frames(path, w, h):
+    """
+    Every frame of the GIF at `path` resized to w×h, as (RGBA image, seconds)
+    pairs.  Decoded once and shared by every frame that shows the GIF.
+    """
+    return _gif_frames(os.path.abspath(path), os.path.getmtime(path), w, h)
+
+def overlay_frames(base, overlays, duration, fill):
+    """
+    Yield (image, seconds) covering `duration`: `base` with every overlay's
+    rectangle cleared to `fill` and redrawn with the GIF's current frame,
+    starting a new image whenever any of the GIFs advances.  GIFs loop.
+    The yielded image is reused, so consume it before the next one.
+    """
+    canvas = base.copy()
+    fill = tuple(fill)
+    tracks = [(ov, gif_frames(ov['path'], ov['w'], ov['h'])) for ov in overlays]
+    pos = [0] * len(tracks)          # current frame of each GIF
+    due = [0.0] * len(tracks)        # when each GIF shows its next frame
+    now = 0.0
+    while now < duration:
+        for k, (ov, frames) in enumerate(tracks):
+            if due[k] <= now:
+                frame, delay = frames[pos[k]]
+                canvas.paste(fill, (ov['x'], ov['y'], ov['x'] + ov['w'], ov['y'] + ov['h']))
+                canvas.paste(frame, (ov['x'], ov['y']), frame)
+                pos[k] = (pos[k] + 1) % len(frames)
+                due[k] += delay
+        step = min(min(due), duration) - now
+        yield canvas, step
+        now += step
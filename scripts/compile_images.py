@@ -1,64 +1,612 @@
 # scripts/compile_images.py
 
-import os, json, subprocess
+import os, json, subprocess, hashlib, shutil, tempfile, queue, threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from scripts.conversation import load_conversation
+except ImportError:  # run directly as scripts/compile_images.py
+    from conversation import load_conversation
+
+# Output frame rate, matching the `-r 25` used for the concat input
+FPS = 25
+
+# Longest run of events encoded as one cached segment
+MAX_SEGMENT_EVENTS = 50
+
+# Frames buffered between the renderer and the thread feeding ffmpeg
+STREAM_QUEUE = 4
+
+def fit_filter(cfg):
+    """
+    The filter that places a chat frame on the square video canvas, or
+    None when the renderer already draws world_width × world_width frames
+    (video_settings.fixed_canvas).
+    """
+    if cfg.get('video_settings', {}).get('fixed_canvas', False):
+        return None
+    w = cfg['layout']['world_width']
+    return f"scale={w}:-2,pad={w}:{w}:(ow-iw)/2:(oh-ih)/2"
 
 def load_config(path):
     cfg = json.load(open(path, encoding='utf8'))
     cfg['paths']['chat_output'] = os.path.normpath(cfg['paths']['chat_output'])
     return cfg
 
-def build_concat_file(cfg, convo):
+def build_concat_file(cfg, frames):
+    """
+    Write the concat list of `frames`, (png path, seconds) pairs as
+    returned by _frame_list.
+    """
     chat = cfg['paths']['chat_output']
-    lines = []
     last_img = None
-    for i, ev in enumerate(convo,1):
-        img = os.path.join("..", chat, f"{i:03d}.png")
-        lines.append(f"file '{img}'\noutpoint {ev['duration']}")
-        last_img = img
-    # Add final frame with minimal duration
-    if last_img:
-        lines.append(f"file '{last_img}'\noutpoint 0.04")
     cf = os.path.join(chat, 'concat.txt')
     with open(cf, 'w', encoding='utf8') as f:
-        f.write("\n".join(lines))
+        for img, duration in frames:
+            if last_img:
+                f.write("\n")
+            f.write(f"file '{img}'\noutpoint {duration}")
+            last_img = img
+        # Add final frame with minimal duration
+        if last_img:
+            f.write(f"\nfile '{last_img}'\noutpoint 0.04")
     return cf
 
-def compile_video(cfg, convo):
-    concat = build_concat_file(cfg, convo)
+def compile_video(cfg, convo, workers=1, threads=None):
+    """
+    Encode chat_output/NNN.png into the silent video.
+    With a segment cache configured only changed segments are encoded;
+    with `workers` > 1 the video is encoded as that many time ranges in
+    parallel ffmpeg processes, each limited to `threads` encoder threads.
+    """
+    # one pass over the events, which a lazy Conversation reads from disk
+    frames, blocks = _frame_list(cfg, convo)
+    animated = any(_overlays(path) for path, _ in frames)
+    # frames written as dirty boxes (generate_chat --deltas) have no full PNG
+    deltas = any(_delta(path) for path, _ in frames)
+    use_segments = cfg['paths'].get('segment_cache') or workers > 1 or animated or deltas
+    if use_segments:
+        if not cfg.get('video_settings', {}).get('fade_transitions', False):
+            if cfg['paths'].get('segment_cache'):
+                return compile_video_segments(cfg, frames, blocks, workers, threads)
+            return compile_video_parallel(cfg, frames, workers, threads)
+        print("ℹ️  Fade transitions span the whole video, encoding in one pass"
+              + (" (GIFs stay on their first frame)" if animated else ""))
+
+    concat = build_concat_file(cfg, frames)
     os.makedirs('output', exist_ok=True)
     out = cfg['paths']['ffmpeg_output']
-    w = cfg['layout']['world_width']
     
     # Check if fade transitions are enabled in config
     use_fades = cfg.get('video_settings', {}).get('fade_transitions', False)
     fade_duration = cfg.get('video_settings', {}).get('fade_duration', 0.3)
     
+    filters = [fit_filter(cfg)] if fit_filter(cfg) else []
     if use_fades:
-        # Create video with fade transitions using complex filter
-        cmd = [
-            'ffmpeg', '-f', 'concat', '-safe', '0', '-i', concat,
-            '-vcodec', 'libx264', '-r', '25', '-crf', '25',
-            '-vf', f"scale={w}:-2,pad={w}:{w}:(ow-iw)/2:(oh-ih)/2,fade=t=in:st=0:d={fade_duration},fade=t=out:st=0:d={fade_duration}",
-            '-pix_fmt', 'yuv420p', out
-        ]
-    else:
-        # Original compilation without fades
-        cmd = [
-            'ffmpeg', '-f', 'concat', '-safe', '0', '-i', concat,
-            '-vcodec', 'libx264', '-r', '25', '-crf', '25',
-            '-vf', f"scale={w}:-2,pad={w}:{w}:(ow-iw)/2:(oh-ih)/2",
-            '-pix_fmt', 'yuv420p', out
-        ]
+        # Create video with fade transitions
+        filters += [f"fade=t=in:st=0:d={fade_duration}", f"fade=t=out:st=0:d={fade_duration}"]
+    cmd = [
+        'ffmpeg', '-f', 'concat', '-safe', '0', '-i', concat,
+        '-vcodec', 'libx264', '-r', '25', '-crf', '25',
+    ]
+    if filters:
+        cmd += ['-vf', ",".join(filters)]
+    cmd += ['-pix_fmt', 'yuv420p', out]
+    if threads:
+        cmd[-1:-1] = ['-threads', str(threads)]
     
     subprocess.run(cmd, check=True)
     os.remove(concat)
 
+# ——— Segment cache ————————————————————————————————————————————————————
+#
+# With cfg['paths']['segment_cache'] set, the timeline is cut into segments
+# where each speaker's block ends (join/leave/typing events go with the block
+# after them) and each segment is encoded to its own H.264 chunk, named by a
+# hash of its frames, durations and encoder settings.  Only segments whose
+# hash is new are encoded; the chunks are then joined with stream copy.
+
+def _png_digest(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def _frame_list(cfg, convo):
+    """
+    (png path, seconds) of every event, and the block each event belongs
+    to: the speaker of a message, else None (see plan_segments).  Paths
+    are absolute, since ffmpeg resolves concat entries relative to the
+    list file.
+    """
+    chat = cfg['paths']['chat_output']
+    frames, blocks = [], []
+    for i, ev in enumerate(convo, 1):
+        frames.append((os.path.abspath(os.path.join(chat, f"{i:03d}.png")), float(ev['duration'])))
+        blocks.append(ev['actor'] if ev['type'] == 'message' else None)
+    return frames, blocks
+
+def _overlays(path):
+    """
+    Animated GIF overlays of the frame at `path` (NNN.overlays.json written
+    by generate_chat), or None.
+    """
+    sidecar = f"{path[:-len('.png')]}.overlays.json"
+    if not os.path.isfile(sidecar):
+        return None
+    with open(sidecar, encoding='utf8') as f:
+        return json.load(f)
+
+def _delta(path):
+    """
+    Dirty box record of the frame at `path` (NNN.delta.json written by
+    generate_chat, with the 'box' stored in NNN.tile.png and the frame
+    'size'), or None when the frame is a full PNG.
+    """
+    sidecar = f"{path[:-len('.png')]}.delta.json"
+    if not os.path.isfile(sidecar):
+        return None
+    with open(sidecar, encoding='utf8') as f:
+        return json.load(f)
+
+def _delta_chain(path):
+    """
+    Paths of the frames from the last full PNG up to `path`.
+    """
+    folder, name = os.path.split(path)
+    idx = int(name[:-len('.png')])
+    chain = [path]
+    while _delta(chain[0]):
+        idx -= 1
+        chain.insert(0, os.path.join(folder, f"{idx:03d}.png"))
+    return chain
+
+def _frame_digest(path):
+    delta = _delta(path)
+    if not delta:
+        return _png_digest(path)
+    tile = _png_digest(f"{path[:-len('.png')]}.tile.png") if delta['box'] else 'same'
+    return f"{tile} {delta['box']} {delta['size']}"
+
+def _isolate_overlays(groups):
+    """
+    Split groups of frames so that every frame with GIF overlays is encoded
+    as a segment of its own (see encode_overlay_segment).
+    """
+    split = []
+    for frames in groups:
+        current = []
+        for frame in frames:
+            if _overlays(frame[0]):
+                if current:
+                    split.append(current)
+                    current = []
+                split.append([frame])
+            else:
+                current.append(frame)
+        if current:
+            split.append(current)
+    return split
+
+def _isolate_deltas(groups):
+    """
+    Split groups of frames so that every run of frames written as dirty
+    boxes is a segment of its own (see encode_delta_segment), starting
+    with the full frame it builds on when that is in the same group.
+    """
+    split = []
+    for frames in groups:
+        current = []
+        in_run = False
+        for frame in frames:
+            delta = bool(_delta(frame[0]))
+            if delta and not in_run:
+                if current[:-1]:
+                    split.append(current[:-1])
+                current = current[-1:]
+            elif in_run and not delta:
+                split.append(current)
+                current = []
+            in_run = delta
+            current.append(frame)
+        if current:
+            split.append(current)
+    return split
+
+def _snap_segments(segments):
+    """
+    Turn lists of (png path, seconds) into segment dicts with 'frames' and
+    'count', the segment's length in output frames.  Bounds are snapped to
+    the global FPS grid so timings stay identical to a single full encode.
+    """
+    planned = []
+    elapsed = 0.0
+    first = 0
+    for n, frames in enumerate(segments):
+        elapsed += sum(d for _, d in frames)
+        last = round(elapsed * FPS)
+        if n == len(segments) - 1:
+            last += 1  # final frame with minimal duration, like the concat list
+        planned.append({'frames': frames, 'count': last - first})
+        first = last
+    return planned
+
+def plan_segments(frames, blocks):
+    """
+    Group `frames` into cacheable segments, cut at block boundaries (see
+    _frame_list).  Join, leave and typing events join the segment of the
+    block that follows them rather than getting a tiny segment each.
+    """
+    segments = []
+    current = []
+    prev = None
+    for frame, block in zip(frames, blocks):
+        if current and ((prev is not None and block != prev) or len(current) >= MAX_SEGMENT_EVENTS):
+            segments.append(current)
+            current = []
+        current.append(frame)
+        prev = block
+    if current:
+        segments.append(current)
+    return _snap_segments(_isolate_deltas(_isolate_overlays(segments)))
+
+def plan_ranges(frames, n):
+    """
+    Split `frames` into at most `n` contiguous ranges of roughly equal
+    duration.
+    """
+    total = sum(d for _, d in frames)
+    ranges = []
+    current = []
+    elapsed = 0.0
+    for frame in frames:
+        current.append(frame)
+        elapsed += frame[1]
+        if len(ranges) < n - 1 and elapsed >= total * (len(ranges) + 1) / n:
+            ranges.append(current)
+            current = []
+    if current:
+        ranges.append(current)
+    return _snap_segments(_isolate_deltas(_isolate_overlays(ranges)))
+
+def segment_key(cfg, seg):
+    """
+    Cache key of a segment: frame contents, durations and encoder settings.
+    """
+    w = cfg['layout']['world_width']
+    parts = [f"libx264 crf=25 r={FPS} w={w} yuv420p n={seg['count']}"]
+    # frames before the segment that its first frame is built from
+    parts += [_frame_digest(path) for path in _delta_chain(seg['frames'][0][0])[:-1]]
+    parts += [f"{_frame_digest(path)} {dur}" for path, dur in seg['frames']]
+    for path, _ in seg['frames']:
+        for ov in _overlays(path) or []:
+            parts.append(f"{_png_digest(ov['path'])} {ov['x']} {ov['y']} {ov['w']} {ov['h']}")
+    return hashlib.sha1("\n".join(parts).encode('utf8')).hexdigest()
+
+def encode_segment(cfg, seg, out, threads=None):
+    """
+    Encode one segment to `out` with exactly seg['count'] frames.
+    Every segment starts on a keyframe at the fixed FPS, so segments can be
+    joined with stream copy.
+    """
+    overlays = _overlays(seg['frames'][0][0]) if len(seg['frames']) == 1 else None
+    if overlays:
+        return encode_overlay_segment(cfg, seg, out, overlays, threads)
+    if any(_delta(path) for path, _ in seg['frames']):
+        return encode_delta_segment(cfg, seg, out, threads)
+    lines = [f"file '{path}'\noutpoint {dur}" for path, dur in seg['frames']]
+    # repeat the last image so the final frame is not dropped
+    lines.append(f"file '{seg['frames'][-1][0]}'\noutpoint 0.04")
+    listfile = f"{out}.txt"
+    with open(listfile, 'w', encoding='utf8') as f:
+        f.write("\n".join(lines))
+    tmp = f"{out}.tmp.mp4"
+    cmd = [
+        'ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', listfile,
+        '-vcodec', 'libx264', '-r', str(FPS), '-crf', '25',
+    ]
+    if fit_filter(cfg):
+        cmd += ['-vf', fit_filter(cfg)]
+    cmd += ['-pix_fmt', 'yuv420p', '-frames:v', str(seg['count']), tmp]
+    if threads:
+        cmd[-1:-1] = ['-threads', str(threads)]
+    try:
+        subprocess.run(cmd, check=True)
+        os.replace(tmp, out)
+    finally:
+        os.remove(listfile)
+
+def encode_overlay_segment(cfg, seg, out, overlays, threads=None):
+    """
+    Encode a one-frame segment whose frame shows animated GIFs: the PNG is
+    looped as the base layer, each GIF's rectangle is cleared to the
+    background and the looping GIF overlaid on it, then the result is
+    scaled and padded like every other frame.
+    """
+    bg = "0x{:02x}{:02x}{:02x}".format(*cfg['layout']['world_color'][:3])
+    cmd = ['ffmpeg', '-y', '-loop', '1', '-framerate', str(FPS), '-i', seg['frames'][0][0]]
+    boxes = ",".join(f"drawbox=x={ov['x']}:y={ov['y']}:w={ov['w']}:h={ov['h']}:color={bg}:t=fill"
+                     for ov in overlays)
+    graph = [f"[0:v]{boxes}[v0]"]
+    for k, ov in enumerate(overlays, 1):
+        cmd += ['-ignore_loop', '0', '-i', ov['path']]
+        graph.append(f"[{k}:v]scale={ov['w']}:{ov['h']}:flags=lanczos[g{k}]")
+        graph.append(f"[v{k-1}][g{k}]overlay={ov['x']}:{ov['y']}[v{k}]")
+    graph.append(f"[v{len(overlays)}]{fit_filter(cfg) or 'null'}[out]")
+    tmp = f"{out}.tmp.mp4"
+    cmd += [
+        '-filter_complex', ";".join(graph), '-map', '[out]',
+        '-vcodec', 'libx264', '-r', str(FPS), '-crf', '25',
+        '-pix_fmt', 'yuv420p', '-frames:v', str(seg['count']), tmp
+    ]
+    if threads:
+        cmd[-1:-1] = ['-threads', str(threads)]
+    subprocess.run(cmd, check=True)
+    os.replace(tmp, out)
+
+def encode_delta_segment(cfg, seg, out, threads=None):
+    """
+    Encode a segment whose frames are written as dirty boxes: the full
+    frame they build on is looped as the base layer and each frame's tile
+    is overlaid on it from that frame's first video frame on (tiles of
+    frames before the segment from the start).  The block grows, so it is
+    then moved to each frame's place on the black canvas.  Everything is
+    composed in RGB so the pixels match the full frames exactly, except
+    that odd-height frames are placed as they are rather than stretched
+    by the one row `scale={w}:-2` adds (see frame_geometry).
+    """
+    from PIL import Image  # for the size of the base frame
+    w = cfg['layout']['world_width']
+    chain = _delta_chain(seg['frames'][0][0])
+    with Image.open(chain[0]) as img:
+        height = img.height
+
+    # every frame after the base with the video frame it starts on
+    steps = [(path, 0) for path in chain[1:-1]]
+    elapsed = 0.0
+    for path, dur in seg['frames']:
+        if path != chain[0]:
+            steps.append((path, round(elapsed * FPS)))
+        elapsed += dur
+
+    cmd = ['ffmpeg', '-y', '-loop', '1', '-framerate', str(FPS), '-i', chain[0]]
+    graph = [f"[0:v]pad={w}:{w}:0:0:black[b0]"]
+    offset = (w - height) // 2
+    y = [str(offset)]
+    last = 0
+    for path, start in steps:
+        delta = _delta(path)
+        box = delta['box']
+        if box:
+            cmd += ['-i', f"{path[:-len('.png')]}.tile.png"]
+            k = last + 1
+            enable = f":enable='gte(t,{(start - 0.5) / FPS})'" if start else ""
+            graph.append(f"[b{last}][{k}:v]overlay={box[0]}:{box[1]}:format=rgb{enable}[b{k}]")
+            last = k
+        moved = (w - delta['size'][1]) // 2
+        if moved != offset:
+            y.append(f"{moved - offset}*gte(t,{(start - 0.5) / FPS})")
+            offset = moved
+    graph.append(f"color=black:s={w}x{w}:r={FPS}[bg]")
+    graph.append(f"[bg][b{last}]overlay=0:'{'+'.join(y)}':eval=frame:format=rgb,format=yuv420p[out]")
+    tmp = f"{out}.tmp.mp4"
+    cmd += [
+        '-filter_complex', ";".join(graph), '-map', '[out]',
+        '-vcodec', 'libx264', '-r', str(FPS), '-crf', '25',
+        '-pix_fmt', 'yuv420p', '-frames:v', str(seg['count']), tmp
+    ]
+    if threads:
+        cmd[-1:-1] = ['-threads', str(threads)]
+    subprocess.run(cmd, check=True)
+    os.replace(tmp, out)
+
+def concat_segments(paths, out):
+    """
+    Join encoded chunks into `out` without re-encoding.
+    """
+    listfile = f"{out}.segments.txt"
+    with open(listfile, 'w', encoding='utf8') as f:
+        f.write("\n".join(f"file '{os.path.abspath(p)}'" for p in paths))
+    try:
+        subprocess.run(['ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', listfile,
+                        '-c', 'copy', out], check=True)
+    finally:
+        os.remove(listfile)
+
+def encode_segments(cfg, todo, workers=1, threads=None):
+    """
+    Encode (segment, output path) pairs, up to `workers` ffmpeg processes
+    at a time.
+    """
+    if workers > 1 and len(todo) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(encode_segment, cfg, seg, path, threads) for seg, path in todo]
+            for fut in futures:
+                fut.result()
+    else:
+        for seg, path in todo:
+            encode_segment(cfg, seg, path, threads)
+
+def compile_video_segments(cfg, frames, blocks, workers=1, threads=None):
+    """
+    compile_video through the segment cache: encode only new segments and
+    stitch all of them with stream copy.
+    """
+    cache = cfg['paths']['segment_cache']
+    os.makedirs(cache, exist_ok=True)
+    os.makedirs('output', exist_ok=True)
+    out = cfg['paths']['ffmpeg_output']
+
+    chunks = []
+    todo = {}
+    for seg in plan_segments(frames, blocks):
+        if seg['count'] <= 0:
+            continue
+        chunk = os.path.join(cache, f"{segment_key(cfg, seg)}.mp4")
+        if not os.path.isfile(chunk):
+            todo[chunk] = seg
+        chunks.append(chunk)
+
+    print(f"Segments: {len(chunks) - len(todo)} reused, {len(todo)} encoded")
+    encode_segments(cfg, [(seg, path) for path, seg in todo.items()], workers, threads)
+    concat_segments(chunks, out)
+
+def compile_video_parallel(cfg, frames, workers, threads=None):
+    """
+    compile_video split into `workers` equal-duration ranges encoded in
+    parallel and joined with stream copy.
+    """
+    os.makedirs('output', exist_ok=True)
+    out = cfg['paths']['ffmpeg_output']
+    tmp = tempfile.mkdtemp(prefix='segments-', dir=cfg['paths']['chat_output'])
+    try:
+        ranges = [seg for seg in plan_ranges(frames, workers) if seg['count'] > 0]
+        todo = [(seg, os.path.join(tmp, f"{n:03d}.mp4")) for n, seg in enumerate(ranges)]
+        encode_segments(cfg, todo, workers, threads)
+        concat_segments([path for _, path in todo], out)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+def frame_geometry(width, height, w, scroll=False):
+    """
+    Where a width×height frame lands on the w×w video canvas, the way the
+    concat path's `scale={w}:-2,pad=...` filters place it: scaled to the
+    canvas width with the height rounded to the nearest even number (so
+    an odd-height frame is stretched by a pixel), then centered.  Frames
+    taller than the canvas, which pad cannot fit, are shrunk to fit.
+    With `scroll` (video_settings.fixed_canvas, where no filters run)
+    frames as wide as the canvas keep their size: centered, or, when
+    taller than the canvas, showing their bottom like a chat window
+    scrolled to the newest message (the offset goes negative).  Returns
+    {'size': [w, h], 'offset': [x, y]}.
+    """
+    if scroll and width == w:
+        y = w - height if height > w else (w - height) // 2
+        return {'size': [width, height], 'offset': [0, y]}
+    # -2 rounds half away from zero, like ffmpeg's av_rescale
+    even = max(2, int(height * w / width / 2 + 0.5) * 2)
+    if even <= w:
+        width, height = w, even
+    else:
+        scale = min(w / width, w / height)
+        width, height = max(1, round(width * scale)), max(1, round(height * scale))
+    return {'size': [width, height], 'offset': [(w - width) // 2, (w - height) // 2]}
+
+def fit_frame(img, w, geometry=None):
+    """
+    Place `img` on a black w×w RGB frame at `geometry` (as planned by the
+    layout pass, else computed with frame_geometry).
+    """
+    from PIL import Image  # only the streaming path touches pixels here
+    img = img.convert('RGB')
+    geometry = geometry or frame_geometry(img.width, img.height, w)
+    if img.size == (w, w) and geometry == frame_geometry(w, w, w):
+        return img
+    size = tuple(geometry['size'])
+    if img.size != size:
+        img = img.resize(size, Image.LANCZOS)
+    frame = Image.new('RGB', (w, w), (0, 0, 0))
+    frame.paste(img, tuple(geometry['offset']))
+    return frame
+
+def stream_video(cfg, frames):
+    """
+    Encode `frames` — (job, PIL image) pairs in event order, as yielded by
+    generate_chat.iter_frames — by piping raw RGB pixels into ffmpeg.
+    Each frame is repeated for its event's duration at FPS, so no PNGs
+    or concat.txt are needed.  Pixels are written to ffmpeg from a
+    separate thread through a bounded queue, so the next frames render
+    while the previous ones are being encoded.
+    """
+    try:
+        from scripts import animation
+    except ImportError:  # run directly as scripts/compile_images.py
+        import animation
+
+    os.makedirs('output', exist_ok=True)
+    out = cfg['paths']['ffmpeg_output']
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    w = cfg['layout']['world_width']
+
+    use_fades = cfg.get('video_settings', {}).get('fade_transitions', False)
+    fade_duration = cfg.get('video_settings', {}).get('fade_duration', 0.3)
+
+    # -y: stdin carries the frames, so ffmpeg cannot ask before overwriting
+    cmd = [
+        'ffmpeg', '-y', '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+        '-s', f"{w}x{w}", '-r', str(FPS), '-i', '-',
+        '-vcodec', 'libx264', '-r', str(FPS), '-crf', '25',
+    ]
+    if use_fades:
+        cmd += ['-vf', f"fade=t=in:st=0:d={fade_duration},fade=t=out:st=0:d={fade_duration}"]
+    cmd += ['-pix_fmt', 'yuv420p', out]
+
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+    pending = queue.Queue(maxsize=STREAM_QUEUE)
+
+    def write_frames():
+        # keep draining after a broken pipe so the producer never blocks
+        broken = False
+        while True:
+            item = pending.get()
+            if item is None:
+                break
+            data, count = item
+            try:
+                if not broken:
+                    for _ in range(count):
+                        proc.stdin.write(data)
+            except BrokenPipeError:
+                broken = True
+        try:
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+
+    writer = threading.Thread(target=write_frames, daemon=True)
+    writer.start()
+    elapsed = 0.0
+    sent = 0
+    data = None
+    try:
+        for job, img in frames:
+            layout = job.get('layout', {})
+            # a frame identical to the previous one (see generate_chat.dirty_box)
+            # reuses its pixels
+            same = data is not None and 'dirty' in layout and layout['dirty'] is None
+            parts = [(img, job['duration'])]
+            if layout.get('overlays'):
+                # only the GIF rectangles change between these images
+                parts = animation.overlay_frames(img, layout['overlays'], job['duration'],
+                                                 cfg['layout']['world_color'])
+            for part, duration in parts:
+                if not same:
+                    data = fit_frame(part, w, layout.get('frame')).tobytes()
+                elapsed += duration
+                # round on the running total so durations never drift
+                target = round(elapsed * FPS)
+                if target > sent:
+                    pending.put((data, target - sent))
+                sent = max(sent, target)
+        # Add final frame with minimal duration, like the concat list
+        if data is not None:
+            pending.put((data, 1))
+    finally:
+        pending.put(None)
+        writer.join()
+        ret = proc.wait()
+    if ret:
+        raise subprocess.CalledProcessError(ret, cmd)
+
 if __name__=='__main__':
     import argparse, json
     p = argparse.ArgumentParser()
     p.add_argument('config')
     p.add_argument('conversation')
+    p.add_argument('--workers', type=int, default=1, help='parallel ffmpeg encoders')
+    p.add_argument('--threads', type=int, default=None, help='encoder threads per ffmpeg process')
     args = p.parse_args()
     cfg   = load_config(args.config)
-    convo = json.load(open(args.conversation, encoding='utf8'))
-    compile_video(cfg, convo)
+    convo = load_conversation(args.conversation)
+    compile_video(cfg, convo, workers=args.workers, threads=args.threads)
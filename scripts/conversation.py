@@ -0,0 +1,91 @@
+# scripts/conversation.py
+#
+# Lazy conversation loading.  A Conversation re-reads its file on every
+# iteration and yields one event at a time, so stages can walk very large
+# scripts (JSON arrays or JSON Lines) without holding them in memory.
+
+import json
+
+# Characters read from the file per refill of the parser buffer
+READ_CHUNK = 1 << 16
+
+def iter_json_array(f, chunk_size=READ_CHUNK):
+    """
+    Incrementally yield the elements of a top-level JSON array from file `f`.
+    """
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+    started = False
+
+    while True:
+        while pos < len(buf) and buf[pos].isspace():
+            pos += 1
+        if pos == len(buf):
+            if eof:
+                raise ValueError("Unexpected end of conversation file (missing ']')")
+            data = f.read(chunk_size)
+            eof = not data
+            buf, pos = buf[pos:] + data, 0
+            continue
+
+        c = buf[pos]
+        if not started:
+            if c != '[':
+                raise ValueError("Conversation file must contain a JSON array of events")
+            started = True
+            pos += 1
+        elif c == ']':
+            return
+        elif c == ',':
+            pos += 1
+        else:
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                end = None
+            if end is None or (end == len(buf) and not eof):
+                # element may continue in the next chunk
+                data = f.read(chunk_size)
+                eof = not data
+                buf, pos = buf[pos:] + data, 0
+                continue
+            yield obj
+            pos = end
+
+def iter_json_lines(f):
+    """
+    Yield one event per non-empty line of a JSON Lines file.
+    """
+    for n, line in enumerate(f, 1):
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"line {n}: {e}") from None
+
+class Conversation:
+    """
+    Re-iterable view of a conversation file (.json array or .jsonl).
+    Every iteration streams events from disk.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __iter__(self):
+        with open(self.path, encoding='utf8') as f:
+            if self.path.endswith('.jsonl'):
+                yield from iter_json_lines(f)
+            else:
+                yield from iter_json_array(f)
+
+    def __repr__(self):
+        return f"Conversation({self.path!r})"
+
+def load_conversation(path):
+    return Conversation(path)
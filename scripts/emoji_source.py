@@ -0,0 +1,92 @@
+# scripts/emoji_source.py
+#
+# Offline emoji images for Pilmoji.  Emoji are read from a directory or zip
+# of PNGs named by their codepoints in lowercase hex joined with '-'
+# (Twemoji's naming, e.g. 1f525.png, 1f468-200d-1f4bb.png), so rendering
+# never touches the network.
+
+import io, os, math, zipfile, functools
+
+from PIL import Image
+from pilmoji.source import BaseSource
+
+# Upper bound on cached decoded-and-resized emoji images
+EMOJI_CACHE_SIZE = 4096
+
+def emoji_filenames(emoji):
+    """
+    Candidate file names for `emoji`: full sequence first, then without
+    variation selectors, which Twemoji usually drops.
+    """
+    cps = [f"{ord(c):x}" for c in emoji]
+    names = ["-".join(cps) + ".png"]
+    stripped = [cp for cp in cps if cp != 'fe0f']
+    if stripped and stripped != cps:
+        names.append("-".join(stripped) + ".png")
+    return names
+
+class LocalEmojiSource(BaseSource):
+    """
+    Pilmoji source backed by a directory or .zip of emoji PNGs.
+    File bytes are read once and kept in memory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._zip = zipfile.ZipFile(path) if zipfile.is_zipfile(path) else None
+        if self._zip is not None:
+            # index by base name so archives with a top-level folder work too
+            self._members = {os.path.basename(n): n for n in self._zip.namelist() if n.endswith('.png')}
+        self._bytes = {}
+
+    def _read(self, name):
+        if self._zip is not None:
+            member = self._members.get(name)
+            return self._zip.read(member) if member else None
+        full = os.path.join(self.path, name)
+        if os.path.isfile(full):
+            with open(full, 'rb') as f:
+                return f.read()
+        return None
+
+    def get_bytes(self, emoji):
+        if emoji not in self._bytes:
+            data = None
+            for name in emoji_filenames(emoji):
+                data = self._read(name)
+                if data:
+                    break
+            self._bytes[emoji] = data
+        return self._bytes[emoji]
+
+    def get_emoji(self, emoji, /):
+        data = self.get_bytes(emoji)
+        return io.BytesIO(data) if data else None
+
+    def get_discord_emoji(self, id, /):
+        return None
+
+_SOURCES = {}
+
+def get_source(path):
+    """
+    Shared LocalEmojiSource for `path` (one per process).
+    """
+    if path not in _SOURCES:
+        _SOURCES[path] = LocalEmojiSource(path)
+    return _SOURCES[path]
+
+@functools.lru_cache(maxsize=EMOJI_CACHE_SIZE)
+def emoji_tile(path, emoji, size):
+    """
+    Decoded RGBA image of `emoji` scaled the way Pilmoji scales it for a
+    font of `size` (width = size, height by aspect), or None if missing.
+    Shared between calls; do not modify.
+    """
+    data = get_source(path).get_bytes(emoji)
+    if not data:
+        return None
+    with Image.open(io.BytesIO(data)) as img:
+        img = img.convert('RGBA')
+        width = int(size)
+        return img.resize((width, math.ceil(img.height / img.width * width)), Image.LANCZOS)
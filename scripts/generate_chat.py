@@ -3,12 +3,33 @@
 import os
 import json
 import datetime
+import functools
+import hashlib
+import math
 import random
 import re
+import shutil
+import struct
+import time
+from collections import OrderedDict, deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
 
-from PIL import Image, ImageFont, ImageDraw
+from PIL import Image, ImageFont, ImageDraw, ImageChops
 from pilmoji import Pilmoji
 
+try:
+    from scripts import profiling, emoji_source, animation
+    from scripts.conversation import load_conversation
+    from scripts.script_validator import ATTACHMENT_SIZES
+    from scripts.compile_images import frame_geometry, fit_frame
+except ImportError:  # run directly as scripts/generate_chat.py
+    import profiling, emoji_source, animation
+    from conversation import load_conversation
+    from script_validator import ATTACHMENT_SIZES
+    from compile_images import frame_geometry, fit_frame
+from pilmoji.helpers import to_nodes, NodeType
+
 # Global flag for edited messages
 EDITED_FLAG = False
 
@@ -63,223 +84,423 @@ def rgb(hexcol):
     h = hexcol.lstrip('#')
     return tuple(int(h[i:i+2],16) for i in (0,2,4))
 
+# Loaded fonts by (file, size), kept for the life of the process so
+# repeated renders (batch jobs, benchmarks) reuse them and their width cache
+_FONTS = {}
+
 def init_fonts(cfg):
     fd = cfg['paths']['fonts_dir']
     fonts = {}
     for key,spec in cfg['layout']['fonts'].items():
-        fonts[key] = ImageFont.truetype(
-            os.path.join(fd, spec['file']),
-            spec['size']
-        )
+        path = os.path.join(fd, spec['file'])
+        font_key = (os.path.abspath(path), spec['size'])
+        if font_key not in _FONTS:
+            _FONTS[font_key] = ImageFont.truetype(path, spec['size'])
+        fonts[key] = _FONTS[font_key]
     return fonts
 
+# ——— Asset cache ——————————————————————————————————————————————————
+#
+# Profile pictures, badges and arrows are decoded and thumbnailed once per
+# (path, mtime, size) and kept as ready-to-paste RGBA tiles.  When
+# cfg['paths']['asset_cache'] is set the tiles are also stored there as raw
+# pixels, so later runs skip image decoding altogether.
+
+_ASSETS = {}
+
+def _asset_cache_file(cache_dir, key):
+    digest = hashlib.sha1(repr(key).encode('utf8')).hexdigest()
+    return os.path.join(cache_dir, f"{digest}.rgba")
+
+def _read_cached_tile(path):
+    with open(path, 'rb') as f:
+        w, h, has_mask = struct.unpack('<III', f.read(12))
+        tile = Image.frombytes('RGBA', (w, h), f.read(w * h * 4))
+        mask = Image.frombytes('L', (w, h), f.read(w * h)) if has_mask else None
+    return tile, mask
+
+def _write_cached_tile(path, tile, mask):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(struct.pack('<III', tile.width, tile.height, mask is not None))
+        f.write(tile.tobytes())
+        if mask is not None:
+            f.write(mask.tobytes())
+    os.replace(tmp, path)
+
+def load_tile(path, size, cfg, round_mask=False):
+    """
+    Return (tile, mask) for the image at `path` thumbnailed to fit size×size.
+    `mask` is a circular 'L' mask when `round_mask` is set, else None.
+    Tiles are shared between calls and must not be modified.
+    """
+    key = (os.path.abspath(path), os.path.getmtime(path), size, round_mask)
+    if key in _ASSETS:
+        return _ASSETS[key]
+
+    cache_dir = cfg['paths'].get('asset_cache')
+    cache_file = _asset_cache_file(cache_dir, key) if cache_dir else None
+
+    if cache_file and os.path.isfile(cache_file):
+        entry = _read_cached_tile(cache_file)
+    else:
+        tile = Image.open(path).convert('RGBA')
+        tile.thumbnail((size, size), Image.LANCZOS)
+        mask = None
+        if round_mask:
+            mask = Image.new('L', tile.size, 0)
+            ImageDraw.Draw(mask).ellipse((0, 0, *tile.size), fill=255)
+        entry = (tile, mask)
+        if cache_file:
+            os.makedirs(cache_dir, exist_ok=True)
+            _write_cached_tile(cache_file, tile, mask)
+
+    _ASSETS[key] = entry
+    return entry
+
+# Attachments can be full-size photos and screenshots, so their thumbnails
+# live in a bounded LRU (and in the asset cache on disk, when configured)
+# rather than for the whole run
+THUMB_CACHE_SIZE = 128
+
+_THUMBS = OrderedDict()
+
+def load_thumbnail(path, max_w, max_h, cfg):
+    """
+    RGBA thumbnail of the image attachment at `path`, fitted to max_w×max_h
+    (see thumbnail_size).  JPEGs are decoded at a reduced scale when that
+    still leaves twice the target size to resample from.  Thumbnails are
+    shared between calls and must not be modified.
+    """
+    key = ('thumb', os.path.abspath(path), os.path.getmtime(path), max_w, max_h)
+    if key in _THUMBS:
+        _THUMBS.move_to_end(key)
+        return _THUMBS[key]
+
+    cache_dir = cfg['paths'].get('asset_cache')
+    cache_file = _asset_cache_file(cache_dir, key) if cache_dir else None
+
+    if cache_file and os.path.isfile(cache_file):
+        thumb, _ = _read_cached_tile(cache_file)
+    else:
+        with Image.open(path) as img:
+            size = thumbnail_size(img.size, (max_w, max_h))
+            if size == img.size:
+                thumb = img.convert('RGBA')
+            else:
+                if img.format == 'JPEG':
+                    img.draft(None, (size[0] * 2, size[1] * 2))
+                thumb = img.convert('RGBA').resize(size, Image.LANCZOS, reducing_gap=2.0)
+        if cache_file:
+            os.makedirs(cache_dir, exist_ok=True)
+            _write_cached_tile(cache_file, thumb, None)
+
+    _THUMBS[key] = thumb
+    if len(_THUMBS) > THUMB_CACHE_SIZE:
+        _THUMBS.popitem(last=False)
+    return thumb
+
 # ——— Rendering functions ——————————————————————————————————————————————
-def calculate_rendered_width(text, font):
+# Upper bound on cached (font, token kind, text) widths
+WIDTH_CACHE_SIZE = 65536
+
+@functools.lru_cache(maxsize=WIDTH_CACHE_SIZE)
+def token_width(font, kind, text):
     """
-    Calculate the actual rendered width including emoji spacing.
+    Rendered width of a single parsed token in `font`, cached.
+    Emoji tokens include their 4px left + 8px right padding.
     """
-    total_width = 0
-    tokens = parse_md(text)
-    
-    for kind, content in tokens:
-        if kind == 'emoji_spaced':
-            # Account for emoji padding: 4px left + 8px right = 12px total
-            emoji_width = font.getbbox(content)[2]
-            total_width += emoji_width + 12  # 4 + 8 padding
+    w = font.getbbox(text)[2]
+    if kind == 'emoji_spaced':
+        w += 12  # 4 + 8 padding
+    return w
+
+# Font used to draw each token kind
+TOKEN_FONTS = {
+    'text': 'message',
+    'bold': 'message_bold',
+    'italic': 'message_italic',
+    'bolditalic': 'message_bold_italic',
+    'strike': 'message_strike',
+    'link': 'message',
+    'emoji_spaced': 'message',
+    'mention': 'mention',
+    'channel mention': 'mention',
+}
+
+# Styled spans are the only tokens that can contain spaces
+SPAN_KINDS = ('bold', 'italic', 'bolditalic', 'strike')
+
+def tokenize_message(text, fonts, cfg):
+    """
+    Parse `text` once into draw-ready tokens (kind, text, font_key, width),
+    where width is the horizontal advance used when drawing.  Styled spans
+    are split at spaces so a line can break inside them and keep its style;
+    whitespace runs collapse to a single space.
+    """
+    mention_pad = cfg['layout']['message']['mention_pad']
+    tokens = []
+    for kind, content in parse_md(text):
+        pieces = re.split(r"(\s+)", content) if kind in SPAN_KINDS or content.isspace() else [content]
+        for piece in pieces:
+            if not piece:
+                continue
+            if piece.isspace():
+                piece = " "
+            key = TOKEN_FONTS.get(kind, 'mention')
+            w = token_width(fonts[key], kind, piece)
+            if key == 'mention':
+                w += mention_pad
+            tokens.append((kind, piece, key, w))
+    return tokens
+
+def wrap_tokens(tokens, max_width):
+    """
+    Greedy wrap of `tokens` into lines no wider than `max_width`, breaking
+    only at spaces.  A word wider than the line gets a line of its own.
+    Returns a list of token lists without leading/trailing spaces.
+    """
+    # group into words: runs of non-space tokens, each with the spaces before it
+    words = []
+    spaces = []
+    joined = False
+    for tok in tokens:
+        if tok[1] == " ":
+            spaces.append(tok)
+            joined = False
+        elif joined:
+            words[-1][1].append(tok)
         else:
-            # Regular text, use actual font measurement
-            total_width += font.getbbox(content)[2]
-    
-    return total_width
+            words.append((spaces, [tok]))
+            spaces = []
+            joined = True
 
-def wrap_text(text, font, max_width):
-    words = text.split()
     lines = []
-    current = ""
-    
-    for i, word in enumerate(words):
-        # Test the line with the new word added
-        test_line = f"{current} {word}".strip()
-        
-        # Calculate actual rendered width including emoji spacing
-        rendered_width = calculate_rendered_width(test_line, font)
-        
-        if rendered_width <= max_width:
-            current = test_line
-        else:
-            # Line would be too wide, wrap it
-            if current:
-                lines.append(current)
-                current = word
-            else:
-                # Even single word is too wide, but we must include it
-                current = word
-            
-            # Check if even a single word is too wide
-            single_word_width = calculate_rendered_width(word, font)
-            if single_word_width > max_width:
-                # Word itself is too wide due to emoji spacing
-                # Check if it's an emoji causing the issue
-                tokens = parse_md(word)
-                emoji_tokens = [t for t in tokens if t[0] == 'emoji_spaced']
-                if emoji_tokens:
-                    # Force break before emoji if possible
-                    lines.append(current)
-                    current = ""
-    
-    # Handle the last line - critical for emojis at the end
-    if current:
-        final_width = calculate_rendered_width(current, font)
-        if final_width > max_width:
-            # Final line is too wide, try to break it
-            words_in_current = current.split()
-            if len(words_in_current) > 1:
-                # Try to find a good break point
-                for split_idx in range(len(words_in_current) - 1, 0, -1):
-                    line_part = " ".join(words_in_current[:split_idx])
-                    remaining_part = " ".join(words_in_current[split_idx:])
-                    
-                    line_width = calculate_rendered_width(line_part, font)
-                    if line_width <= max_width:
-                        lines.append(line_part)
-                        # Check if remaining part also fits
-                        remaining_width = calculate_rendered_width(remaining_part, font)
-                        if remaining_width <= max_width:
-                            lines.append(remaining_part)
-                        else:
-                            # Recursively wrap the remaining part
-                            remaining_lines = wrap_text(remaining_part, font, max_width)
-                            lines.extend(remaining_lines)
-                        current = ""
-                        break
-        
-        if current:  # Still have content to add
-            lines.append(current)
-    
+    line = []
+    line_w = 0
+    for lead, word in words:
+        word_w = sum(t[3] for t in word)
+        lead_w = sum(t[3] for t in lead)
+        if line and line_w + lead_w + word_w > max_width:
+            lines.append(line)
+            line, line_w = [], 0
+        if line:
+            line.extend(lead)
+            line_w += lead_w
+        line.extend(word)
+        line_w += word_w
+    if line:
+        lines.append(line)
     return lines
 
-def calculate_attachment_height(attachments, cfg):
+# ——— Layout planning ——————————————————————————————————————————————————
+#
+# The layout pass works out, once per message, the wrapped lines and the box
+# of every attachment, and per frame the block height and where the frame
+# lands on the square video canvas.  It reads image headers only, so a plan
+# can be built, written out and inspected without drawing any pixels;
+# rendering then just executes it.
+
+def attachment_size(path):
+    """
+    (width, height) of an image attachment from its header, or from the
+    sizes recorded during validation.  None when it cannot be read.
+    """
+    if path not in ATTACHMENT_SIZES:
+        try:
+            with Image.open(path) as img:
+                ATTACHMENT_SIZES[path] = img.size
+        except Exception:
+            ATTACHMENT_SIZES[path] = None
+    return ATTACHMENT_SIZES[path]
+
+def thumbnail_size(size, box):
+    """
+    Size that Image.thumbnail(box) gives an image of `size`: shrunk to fit
+    inside `box`, keeping the aspect ratio, never enlarged.
+    """
+    w, h = size
+    x, y = box
+    if x >= w and y >= h:
+        return w, h
+    aspect = w / h
+    if x / y >= aspect:
+        n = y * aspect
+        x = max(min(math.floor(n), math.ceil(n), key=lambda v: abs(aspect - v / y)), 1)
+    else:
+        n = x / aspect
+        y = max(min(math.floor(n), math.ceil(n), key=lambda v: 0 if v == 0 else abs(aspect - x / v)), 1)
+    return x, y
+
+def layout_attachments(attachments, cfg, fonts):
     """
-    Pre-calculate the exact height needed for attachments without rendering them.
-    Returns the total height required for all attachments.
+    Stack `attachments` from y=0 and return (boxes, total height).
+    Each box is a dict with the attachment's type, path and filename plus
+    its y, w and h; 'ok' is False for images that cannot be read, which
+    get an error line instead.
     """
-    if not attachments:
-        return 0
-        
     L = cfg['layout']['attachment']
-    total_height = 0
     max_w = L['max_width']
     pad = L['padding']
-    
+    boxes = []
+    y = 0
     for att in attachments:
-        if att['type'] in ['image', 'gif']:
-            try:
-                # Load the actual image to get its dimensions after thumbnailing
-                img = Image.open(att['path']).convert('RGBA')
-                if img.format == 'GIF':
-                    img.seek(0)  # Go to first frame for GIFs
-                
-                # Calculate the actual size after thumbnail operation
-                original_size = img.size
-                max_h = L['max_height']
-                
-                # Calculate thumbnail size (same logic as PIL.thumbnail)
-                aspect_ratio = original_size[0] / original_size[1]
-                if original_size[0] > max_w or original_size[1] > max_h:
-                    if aspect_ratio > max_w / max_h:
-                        # Width is the limiting factor
-                        new_h = int(max_w / aspect_ratio)
-                    else:
-                        # Height is the limiting factor
-                        new_h = max_h
-                else:
-                    new_h = original_size[1]
-                
-                total_height += new_h + pad
-                img.close()
-            except Exception:
-                # Fallback to estimated height if image can't be loaded
-                total_height += L['max_height'] + pad
-        else:
-            # Text or other file attachments
-            if att['type'] == 'text':
-                total_height += L['text_box_height'] + pad
+        box = {'type': att['type'], 'path': att.get('path'), 'filename': att.get('filename', ''),
+               'y': y, 'w': max_w, 'ok': True}
+        if att['type'] in ('image', 'gif'):
+            size = attachment_size(att['path'])
+            if size:
+                box['w'], box['h'] = thumbnail_size(size, (max_w, L['max_height']))
             else:
-                total_height += L.get('other_box_height', 50) + pad
-    
-    return total_height
+                box['ok'] = False
+                box['h'] = fonts['message'].getbbox(box['filename'])[3]
+        elif att['type'] == 'text':
+            box['h'] = L['text_box_height']
+        else:
+            box['h'] = L['other_box_height']
+        boxes.append(box)
+        y += box['h'] + pad
+    return boxes, y
 
-def render_block(actor, lines, cfg, fonts, profpics, colors, badges, now):
+def layout_message(msg, cfg, fonts):
     """
-    Renders a cumulative block of messages for `actor`, with each message
-    wrapped to fit the world_width and canvas height automatically adjusted
-    based on content length (text + attachments).
-    
-    The function dynamically calculates the required height by:
-    1. Measuring the actual text content after wrapping
-    2. Pre-calculating attachment dimensions
-    3. Ensuring minimum height for UI elements (profile pic, name, etc.)
+    Plan one message: its wrapped token lines, each paired with whether the
+    "(edited)" marker follows it, and its attachment boxes.
     """
     L = cfg['layout']
-    world_w = L['world_width']
-    x0 = L['message']['x']
-    max_text_w = world_w - x0 - 20
-
-    # 1) wrap every logical line into sub-lines
-    wrapped = []  # will hold (sublined_text, edited_flag)
-    attachments = []
-    for msg in lines:
-        # Extract attachments if present
-        if 'attachments' in msg:
-            attachments.extend(msg['attachments'])
-            
-        sublines = wrap_text(msg['text'], fonts['message'], max_text_w)
-
-        for i, sl in enumerate(sublines):
-            wrapped.append((sl, msg['edited'] if (i == len(sublines)-1) else False))
+    max_text_w = L['world_width'] - L['message']['x'] - 20
+    sublines = wrap_tokens(tokenize_message(msg['text'], fonts, cfg), max_text_w)
+    wrapped = [(sl, msg['edited'] if (i == len(sublines)-1) else False) for i, sl in enumerate(sublines)]
+    boxes, att_h = layout_attachments(msg.get('attachments') or [], cfg, fonts)
+    return {'wrapped': wrapped, 'attachments': boxes, 'att_h': att_h}
 
-
-    # 2) DYNAMIC HEIGHT CALCULATION - Auto-resize based on content
-    # This ensures the message block is exactly the right size for its content
+def block_height(n_lines, att_h, cfg, fonts):
+    """
+    Height of a message block with `n_lines` wrapped lines and `att_h`
+    pixels of attachments, never less than the profile picture and name need.
+    """
+    L = cfg['layout']
     line_h = L['message']['line_height']
-    
-    # More accurate text height calculation
-    if wrapped:
-        # Calculate actual text height based on font metrics
-        font_height = fonts['message'].getmetrics()[0] + fonts['message'].getmetrics()[1]  # ascent + descent
-        text_height = L['message']['y'] + (len(wrapped) * line_h) + 10  # Added small padding
+
+    # DYNAMIC HEIGHT CALCULATION - Auto-resize based on content
+    if n_lines:
+        text_height = L['message']['y'] + (n_lines * line_h) + 10  # Added small padding
     else:
         # Minimum text area even with no content
         text_height = L['message']['y'] + line_h
-    
-    # Calculate exact attachment height using helper function
-    attachment_height = calculate_attachment_height(attachments, cfg)
-    
+
     # Calculate total height with proper bottom padding
-    height = text_height + attachment_height + 30  # Added extra bottom padding
-    
+    height = text_height + att_h + 30  # Added extra bottom padding
+
     # Ensure minimum height for profile picture and name/timestamp area
     pic_y, pic_size = L['profpic']['position'][1], L['profpic']['size']
     name_height = L['name']['pos'][1] + fonts['name'].getmetrics()[0] + fonts['name'].getmetrics()[1]
     min_h = max(pic_y + pic_size + 20, name_height + 40)  # Increased margins
-    
-    if height < min_h:
-        height = min_h
-    
-    # Create canvas with the dynamically calculated height
 
-    canvas = Image.new('RGBA', (world_w, height), tuple(L['world_color']))
+    return max(height, min_h)
+
+def draw_emoji(canvas, pil, xy, txt, font, fill, emoji_dir):
+    """
+    Draw an emoji token from the local emoji cache, splitting it into
+    graphemes the way Pilmoji does.  Emoji missing from the cache are
+    drawn by Pilmoji as usual.
+    """
+    x, y = xy
+    for line in to_nodes(txt):
+        for node in line:
+            tile = None
+            if node.type is NodeType.emoji:
+                tile = emoji_source.emoji_tile(emoji_dir, node.content, font.size)
+            if tile is None:
+                pil.text((x, y), node.content, fill, font=font)
+                x += font.getbbox(node.content)[2]
+                continue
+            canvas.paste(tile, (x, y), tile)
+            x += tile.width
+
+def draw_lines(canvas, wrapped, y, cfg, fonts):
+    """
+    Draw wrapped message lines onto `canvas` starting at `y`.
+    `wrapped` is a list of (line_tokens, edited_flag) pairs, with tokens
+    from tokenize_message.
+    Returns the Y offset below the last line.
+    """
+    L = cfg['layout']
+    x0 = L['message']['x']
+    line_h = L['message']['line_height']
+    draw = ImageDraw.Draw(canvas)
+
+    # a local emoji directory/zip makes emoji rendering fully offline
+    emoji_dir = cfg['paths'].get('emoji_dir')
+    pil_args = {'source': emoji_source.get_source(emoji_dir)} if emoji_dir else {}
+
+    with Pilmoji(canvas, **pil_args) as pil:
+        for tokens, was_edited in wrapped:
+            x = x0
+            for kind, txt, key, w in tokens:
+                font = fonts[key]
+                if kind == 'strike':
+                    pil.text((x, y), txt, tuple(L['message']['color']), font=font)
+                    asc,_ = font.getmetrics()
+                    mid = y + asc//1.4
+                    draw.line((x, mid, x + w, mid), fill=tuple(L['message']['color']), width=2)
+                elif kind == 'link':
+                    underline_y = y + font.getmetrics()[0] + 2
+                    pil.text((x, y), txt, (66, 135, 245), font=font)  # blue color
+                    draw.line((x, underline_y, x + w, underline_y), fill=(66, 135, 245), width=1)
+                elif kind == 'emoji' or kind == 'emoji_spaced':
+                    # Render emoji with automatic generous spacing (w already
+                    # includes 4px left + 8px right padding)
+                    left_padding = 4    # Left padding for better appearance
+                    if emoji_dir:
+                        draw_emoji(canvas, pil, (x + left_padding, y + 2), txt, font,
+                                   tuple(L['message']['color']), emoji_dir)
+                    else:
+                        pil.text((x + left_padding, y + 2), txt, tuple(L['message']['color']), font=font)
+                elif key == 'mention':
+                    pad = L['message']['mention_pad']
+                    bg = [x, y-pad//2, x + w, y + font.getbbox(txt)[3] + pad//2]
+                    draw.rounded_rectangle(bg, radius=8, fill=tuple(L['name']['mention_bg']))
+                    pil.text((x+pad/2, y), txt, tuple(L['name']['mention_text']), font=font)
+                else:  # text, bold, italic, bolditalic
+                    pil.text((x, y), txt, tuple(L['message']['color']), font=font)
+                x += w
+            if was_edited:
+                edit_str = " (edited)"
+                # x is already at end-of-line after drawing the last token
+                pil.text((x + 4, y),
+                         edit_str,
+                         tuple(L['message']['color']),
+                         font=fonts['message_italic'])
+
+            y += line_h
+
+    return y
+
+# ——— Incremental block rendering ——————————————————————————————————————————
+#
+# A block is kept as a "body" canvas (background, profile picture, name,
+# badge and every text line drawn so far) plus an attachment strip holding
+# every attachment drawn so far.  Appending a message only wraps and draws
+# that message; the frame is then composed from the two layers plus the
+# per-frame timestamp.
+
+def new_block(actor, cfg, fonts, profpics, colors, badges):
+    """
+    Start an empty block for `actor` with its profile picture, name and badge.
+    """
+    L = cfg['layout']
+    world_w = L['world_width']
+    pic_y, pic_size = L['profpic']['position'][1], L['profpic']['size']
+
+    canvas = Image.new('RGBA', (world_w, max(L['message']['y'], pic_y + pic_size)), tuple(L['world_color']))
     draw = ImageDraw.Draw(canvas)
 
     # paste profile picture
-    pic = Image.open(profpics[actor]).convert('RGBA')
-    pic.thumbnail((pic_size, pic_size), Image.LANCZOS)
-    mask = Image.new('L', pic.size, 0)
-    ImageDraw.Draw(mask).ellipse((0, 0, *pic.size), fill=255)
+    pic, mask = load_tile(profpics[actor], pic_size, cfg, round_mask=True)
     canvas.paste(pic, tuple(L['profpic']['position']), mask)
 
-    # draw name + timestamp
-        # — draw name —
+    # — draw name —
     nx, ny = L['name']['pos']
     draw.text((nx, ny), actor, fill=colors[actor], font=fonts['name'])
 
@@ -287,10 +508,9 @@ def render_block(actor, lines, cfg, fonts, profpics, colors, badges, now):
     badge_filename = badges[actor]
     badge_offset = 0
     if badge_filename:
-        badge_img = Image.open(badge_filename).convert('RGBA')
-        # resize to configured badge size
+        # resized to configured badge size
         size = L['badge']['size']
-        badge_img.thumbnail((size, size), Image.LANCZOS)
+        badge_img, _ = load_tile(badge_filename, size, cfg)
 
         # position badge vertically centered on the name line
         text_h = fonts['name'].getbbox(actor)[3]
@@ -300,82 +520,136 @@ def render_block(actor, lines, cfg, fonts, profpics, colors, badges, now):
         canvas.paste(badge_img, (bx, by), badge_img)
         badge_offset = size + L['badge']['spacing']
 
+    return {
+        'actor': actor,
+        'lines': [],
+        'wrapped': [],
+        'canvas': canvas,
+        'y': L['message']['y'],
+        'time_x': nx + fonts['name'].getbbox(actor)[2] + badge_offset + L['time']['spacing'],
+        'attachments': [],
+        'att_strip': None,
+        'att_h': 0,
+    }
+
+def extend_block(block, msg, cfg, fonts, layout=None):
+    """
+    Draw one more message at the bottom of `block`, following its planned
+    `layout` (see layout_message; computed here when not given).
+    """
+    L = cfg['layout']
+    world_w = L['world_width']
+    line_h = L['message']['line_height']
+
+    if layout is None:
+        layout = layout_message(msg, cfg, fonts)
+    wrapped = layout['wrapped']
+
+    if wrapped:
+        old = block['canvas']
+        needed = block['y'] + len(wrapped) * line_h
+        if needed > old.height:
+            canvas = Image.new('RGBA', (world_w, needed), tuple(L['world_color']))
+            canvas.paste(old, (0, 0))
+            block['canvas'] = canvas
+        block['y'] = draw_lines(block['canvas'], wrapped, block['y'], cfg, fonts)
+        block['wrapped'].extend(wrapped)
+
+    if layout['attachments']:
+        # attachments are drawn on a strip of their own so later text can push them down
+        start = block['att_h']
+        block['att_h'] += layout['att_h']
+        strip = Image.new('RGBA', (world_w, block['att_h']), tuple(L['world_color']))
+        if block['att_strip'] is not None:
+            strip.paste(block['att_strip'], (0, 0))
+        render_attachments(strip, layout['attachments'], cfg, fonts, start)
+        block['att_strip'] = strip
+        block['attachments'].extend(msg.get('attachments') or [])
+
+    block['lines'].append(msg)
+    return block
+
+def compose_block(block, cfg, fonts, now):
+    """
+    Produce the frame for `block`: size it to its content, copy the body,
+    draw the timestamp and place the attachment strip under the text.
+    """
+    L = cfg['layout']
+    world_w = L['world_width']
+    height = block_height(len(block['wrapped']), block['att_h'], cfg, fonts)
+
+    canvas = Image.new('RGBA', (world_w, height), tuple(L['world_color']))
+    canvas.paste(block['canvas'], (0, 0))
+    draw = ImageDraw.Draw(canvas)
+
     # — draw timestamp, shifted right by name width + badge_offset + spacing —
+    nx, ny = L['name']['pos']
     ts = now.strftime('%-I:%M %p')
-    tx = nx + fonts['name'].getbbox(actor)[2] + badge_offset + L['time']['spacing']
+    tx = block['time_x']
     draw.text((tx, ny + 10),
               f"Today at {ts}",
               fill=tuple(L['time']['color']),
               font=fonts['time'])
 
     # ——— ADD: draw "(edited)" next to timestamp if flagged —————————————
-    global EDITED_FLAG
     if EDITED_FLAG:
         edited_txt = " (edited)"
         width_ts = fonts['time'].getbbox(f"Today at {ts}")[2]
         draw.text((tx + width_ts, ny+10), edited_txt, fill=tuple(L['time']['color']), font=fonts['time'])
 
-    # draw wrapped message lines
-    y = L['message']['y']
-    with Pilmoji(canvas) as pil:
-        for raw, was_edited in wrapped:
-            x = x0
-            for kind, txt in parse_md(raw):
-                if kind == 'text':
-                    pil.text((x, y), txt, tuple(L['message']['color']), font=fonts['message'])
-                    w = fonts['message'].getbbox(txt)[2]
-                elif kind == 'bold':
-                    pil.text((x, y), txt, tuple(L['message']['color']), font=fonts['message_bold'])
-                    w = fonts['message_bold'].getbbox(txt)[2]
-                elif kind == 'italic':
-                    pil.text((x, y), txt, tuple(L['message']['color']), font=fonts['message_italic'])
-                    w = fonts['message_italic'].getbbox(txt)[2]
-                elif kind == 'bolditalic':
-                    pil.text((x, y), txt, tuple(L['message']['color']), font=fonts['message_bold_italic'])
-                    w = fonts['message_bold_italic'].getbbox(txt)[2]
-                elif kind == 'strike':
-                    pil.text((x, y), txt, tuple(L['message']['color']), font=fonts['message_strike'])
-                    asc,_ = fonts['message_strike'].getmetrics()
-                    mid = y + asc//1.4
-                    draw.line((x, mid, x + fonts['message_strike'].getbbox(txt)[2], mid), fill=tuple(L['message']['color']), width=2)
-                    w = fonts['message_strike'].getbbox(txt)[2]
-                elif kind == 'link':
-                    underline_y = y + fonts['message'].getmetrics()[0] + 2
-                    pil.text((x, y), txt, (66, 135, 245), font=fonts['message'])  # blue color
-                    draw.line((x, underline_y, x + fonts['message'].getbbox(txt)[2], underline_y), fill=(66, 135, 245), width=1)
-                    w = fonts['message'].getbbox(txt)[2]
-                elif kind == 'emoji' or kind == 'emoji_spaced':
-                    # Render emoji with automatic generous spacing
-                    left_padding = 4    # Left padding for better appearance
-                    right_padding = 8   # Right padding to prevent congestion
-                    
-                    pil.text((x + left_padding, y + 2), txt, tuple(L['message']['color']), font=fonts['message'])
-                    # Calculate width: emoji width + total padding
-                    emoji_width = fonts['message'].getbbox(txt)[2]
-                    w = emoji_width + left_padding + right_padding
-                else:  # mention
-                    pad = L['message']['mention_pad']
-                    w_txt = fonts['mention'].getbbox(txt)[2]
-                    bg = [x, y-pad//2, x + w_txt + pad, y + fonts['mention'].getbbox(txt)[3] + pad//2]
-                    draw.rounded_rectangle(bg, radius=8, fill=tuple(L['name']['mention_bg']))
-                    pil.text((x+pad/2, y), txt, tuple(L['name']['mention_text']), font=fonts['mention'])
-                    w = w_txt + pad
-                x += w
-            if was_edited:
-                edit_str = " (edited)"
-                # x is already at end-of-line after drawing the last token
-                pil.text((x + 4, y),
-                         edit_str,
-                         tuple(L['message']['color']),
-                         font=fonts['message_italic'])
+    # Render attachments below the text (only the attachment column, so the
+    # profile picture is never covered)
+    if block['att_strip'] is not None:
+        ax = L['attachment']['x']
+        strip = block['att_strip']
+        canvas.paste(strip.crop((ax, 0, world_w, strip.height)), (ax, block['y']))
 
-            y += line_h
+    return canvas
 
-    # Render attachments below the text
-    if attachments:
-        render_attachments(canvas, attachments, cfg, fonts, y)
+def render_block(actor, lines, cfg, fonts, profpics, colors, badges, now, layouts=None):
+    """
+    Renders a cumulative block of messages for `actor`, with each message
+    wrapped to fit the world_width and canvas height automatically adjusted
+    based on content length (text + attachments).
+    
+    The function dynamically calculates the required height by:
+    1. Measuring the actual text content after wrapping
+    2. Pre-calculating attachment dimensions
+    3. Ensuring minimum height for UI elements (profile pic, name, etc.)
 
-    return canvas
+    `layouts` holds the planned layout of each message (see layout_frames);
+    missing layouts are computed on the fly.
+    """
+    layouts = layouts or [None] * len(lines)
+    block = new_block(actor, cfg, fonts, profpics, colors, badges)
+    for msg, layout in zip(lines, layouts):
+        extend_block(block, msg, cfg, fonts, layout)
+    return compose_block(block, cfg, fonts, now)
+
+def render_block_incremental(state, actor, lines, cfg, fonts, profpics, colors, badges, now, layouts=None):
+    """
+    Same output as render_block, but reuses the block kept in `state` from
+    the previous call when `lines` only appends one message to it.
+    Edited messages (which replace the last line) and actor changes fall
+    back to a full redraw.  `state` is updated in place.
+    """
+    layouts = layouts or [None] * len(lines)
+    block = state.get('block')
+    reusable = (
+        block is not None
+        and not EDITED_FLAG
+        and block['actor'] == actor
+        and len(lines) == len(block['lines']) + 1
+        and lines[:-1] == block['lines']
+    )
+    if reusable:
+        extend_block(block, lines[-1], cfg, fonts, layouts[-1])
+    else:
+        block = new_block(actor, cfg, fonts, profpics, colors, badges)
+        for msg, layout in zip(lines, layouts):
+            extend_block(block, msg, cfg, fonts, layout)
+        state['block'] = block
+    return compose_block(block, cfg, fonts, now)
 
 def render_typing(ev, cfg, fonts, colors, now):
     """
@@ -418,23 +692,24 @@ def render_typing(ev, cfg, fonts, colors, now):
 
     return canvas
 
-def render_join(ev, cfg, fonts, colors, now):
+def render_join(ev, cfg, fonts, colors, now, template=None):
     """
     Renders a join message with role-colored name.
+    `template` pins the join text; a random one is picked when omitted.
     """
     L = cfg['layout']['joined']
     canvas = Image.new('RGBA', (cfg['layout']['world_width'], L['height']), tuple(cfg['layout']['world_color']))
     draw = ImageDraw.Draw(canvas)
 
     # green arrow
-    arrow = Image.open(cfg['paths']['green_arrow']).convert('RGBA')
-    arrow.thumbnail((40,40), Image.LANCZOS)
+    arrow, _ = load_tile(cfg['paths']['green_arrow'], 40, cfg)
     ax = cfg['layout']['profpic']['position'][0]
     ay = (L['height'] - arrow.height) // 2
     canvas.paste(arrow, (ax, ay), arrow)
 
     # split template around CHARACTER
-    template = random.choice(cfg['joined_texts'])
+    if template is None:
+        template = random.choice(cfg['joined_texts'])
     before, after = template.split("CHARACTER")
     # draw before text
     tx = ax + arrow.width + 20
@@ -448,23 +723,24 @@ def render_join(ev, cfg, fonts, colors, now):
 
     return canvas
 
-def render_leave(ev, cfg, fonts, colors, now):
+def render_leave(ev, cfg, fonts, colors, now, template=None):
     """
     Renders a leave message with role-colored name.
+    `template` pins the leave text; a random one is picked when omitted.
     """
     L = cfg['layout']['left']
     canvas = Image.new('RGBA', (cfg['layout']['world_width'], L['height']), tuple(cfg['layout']['world_color']))
     draw = ImageDraw.Draw(canvas)
 
     # red arrow
-    arrow = Image.open(cfg['paths']['red_arrow']).convert('RGBA')
-    arrow.thumbnail((40,40), Image.LANCZOS)
+    arrow, _ = load_tile(cfg['paths']['red_arrow'], 40, cfg)
     ax = cfg['layout']['profpic']['position'][0]
     ay = (L['height'] - arrow.height) // 2
     canvas.paste(arrow, (ax, ay), arrow)
 
     # split template around CHARACTER
-    template = random.choice(cfg['left_texts'])
+    if template is None:
+        template = random.choice(cfg['left_texts'])
     before, after = template.split("CHARACTER")
     # draw before text
     tx = ax + arrow.width + 20
@@ -478,93 +754,92 @@ def render_leave(ev, cfg, fonts, colors, now):
 
     return canvas
 
-def render_attachments(canvas, attachments, cfg, fonts, start_y):
+def render_attachments(canvas, boxes, cfg, fonts, start_y):
     """
-    Draw attachments below the text block on `canvas`.
-    Returns the new Y offset after rendering all attachments.
+    Draw the attachment `boxes` planned by layout_attachments on `canvas`,
+    starting at `start_y`.  Returns the Y offset below the last one.
     """
     draw = ImageDraw.Draw(canvas)
     L = cfg['layout']['attachment']
     x = L['x']
-    y = start_y
     max_w = L['max_width']
     pad = L['padding']
+    end = start_y
 
-    for att in attachments:
-        if att['type'] == 'image':
-            try:
-                img = Image.open(att['path']).convert('RGBA')
-                # Handle GIFs by taking the first frame
-                if img.format == 'GIF':
-                    img.seek(0)  # Go to first frame
-                img.thumbnail((max_w, L['max_height']), Image.LANCZOS)
-                canvas.paste(img, (x, y), img)
-                y += img.height + pad
-            except Exception as e:
+    for box in boxes:
+        y = start_y + box['y']
+        end = y + box['h'] + pad
+
+        if box['type'] in ('image', 'gif'):
+            if box['ok']:
+                try:
+                    img = load_thumbnail(box['path'], max_w, L['max_height'], cfg)
+                    canvas.paste(img, (x, y), img)
+                except Exception:
+                    box = dict(box, ok=False)
+                else:
+                    if box['type'] == 'gif':
+                        # For GIFs, show the first frame with a GIF indicator
+                        gif_badge = Image.new('RGBA', (40, 20), (88, 101, 242, 200))
+                        badge_draw = ImageDraw.Draw(gif_badge)
+                        badge_draw.text((5, 2), "GIF", fill=(255, 255, 255), font=fonts['message'])
+                        canvas.paste(gif_badge, (x + 5, y + 5), gif_badge)
+            if not box['ok']:
                 # fallback to filename card on error
-                draw.text((x, y), f"[Error loading {att['filename']}]", font=fonts['message'], fill=(255,0,0))
-                y += fonts['message'].getbbox(att['filename'])[3] + pad
-
-        elif att['type'] == 'gif':
-            try:
-                # For GIFs, show a placeholder with GIF indicator
-                gif_img = Image.open(att['path']).convert('RGBA')
-                gif_img.seek(0)  # First frame
-                gif_img.thumbnail((max_w, L['max_height']), Image.LANCZOS)
-                canvas.paste(gif_img, (x, y), gif_img)
-                # Add GIF indicator
-                gif_badge = Image.new('RGBA', (40, 20), (88, 101, 242, 200))
-                badge_draw = ImageDraw.Draw(gif_badge)
-                badge_draw.text((5, 2), "GIF", fill=(255, 255, 255), font=fonts['message'])
-                canvas.paste(gif_badge, (x + 5, y + 5), gif_badge)
-                y += gif_img.height + pad
-            except Exception as e:
-                draw.text((x, y), f"[Error loading GIF {att['filename']}]", font=fonts['message'], fill=(255,0,0))
-                y += fonts['message'].getbbox(att['filename'])[3] + pad
+                label = "GIF " if box['type'] == 'gif' else ""
+                draw.text((x, y), f"[Error loading {label}{box['filename']}]", font=fonts['message'], fill=(255,0,0))
 
-        elif att['type'] == 'text':
+        elif box['type'] == 'text':
             # draw a file icon or just a box with filename
-            box_h = L['text_box_height']
-            draw.rectangle((x, y, x+max_w, y+box_h), outline=L['border_color'])
+            draw.rectangle((x, y, x+max_w, y+box['h']), outline=L['border_color'])
             draw.text((x+pad, y+pad),
-                      att['filename'],
+                      box['filename'],
                       font=fonts['message_bold'],
                       fill=tuple(L['text_color']))
-            y += box_h + pad
 
         else:  # generic other file
-            draw.rectangle((x, y, x+max_w, y+L['other_box_height']), outline=L['border_color'])
+            draw.rectangle((x, y, x+max_w, y+box['h']), outline=L['border_color'])
             draw.text((x+pad, y+pad),
-                      att['filename'],
+                      box['filename'],
                       font=fonts['message'],
                       fill=tuple(L['text_color']))
-            y += L['other_box_height'] + pad
 
-    return y
+    return end
 
-# ——— Main with cumulative logic —————————————————————————————————————————
+# ——— Frame planning ——————————————————————————————————————————————————
 
-def save_images(cfg, convo, chars):
-    out = cfg['paths']['chat_output']
-    os.makedirs(out, exist_ok=True)
-
-    fonts    = init_fonts(cfg)
-    profpics = {n: os.path.join(cfg['paths']['profile_pics'], c['profile_pic']) for n,c in chars.items()}
-    badges = {n: os.path.join(cfg['paths']['badges_dir'], c['badge']) if c['badge'] else None for n, c in chars.items()}
-    colors   = {n: rgb(c['role_color']) for n,c in chars.items()}
+def start_time(cfg):
+    """
+    Timestamp of the first event: video_settings.start_time ("HH:MM")
+    today if set, otherwise the current time.
+    """
+    fixed = cfg.get('video_settings', {}).get('start_time')
+    if fixed:
+        t = datetime.datetime.strptime(fixed, '%H:%M').time()
+        return datetime.datetime.combine(datetime.date.today(), t)
+    return datetime.datetime.now()
 
-    now = datetime.datetime.now()
+def plan_frames(cfg, convo):
+    """
+    Walk the conversation once and yield one job per output frame.
+    Each job holds everything its frame depends on (event type, actor,
+    cumulative message snapshot, timestamp, join/leave template), so jobs
+    can be rendered in any order and in any process.
+    """
+    now = start_time(cfg)
+    seed = cfg.get('video_settings', {}).get('template_seed', 0)
+    seen = {}
     current_actor = None
     current_lines = []
     idx = 1
 
     for ev in convo:
-        if ev['type'] == 'message':
-            global EDITED_FLAG
-            EDITED_FLAG = ev.get('edited', False)
+        job = {'idx': idx, 'type': ev['type'], 'actor': ev['actor'], 'now': now,
+               'duration': float(ev['duration'])}
 
+        if ev['type'] == 'message':
             msg = {
-                'text': ev['text'], 
+                'text': ev['text'],
                 'edited': ev.get('edited', False),
                 'attachments': ev.get('attachments', [])
             }
@@ -576,38 +851,554 @@ def save_images(cfg, convo, chars):
             else:
                 current_actor = ev['actor']
                 current_lines = [msg]
+            job['lines'] = list(current_lines)
+            job['edited'] = msg['edited']
+
+        elif ev['type'] in ('join', 'leave', 'typing'):
+            current_actor = None
+            current_lines = []
+            # draw templates here so serial and parallel runs pick the same text;
+            # seeded per (type, actor, occurrence) so editing other events
+            # leaves the choice, and the cached frame, unchanged
+            if ev['type'] in ('join', 'leave'):
+                n = seen[(ev['type'], ev['actor'])] = seen.get((ev['type'], ev['actor']), 0) + 1
+                rng = random.Random(f"{seed}:{ev['type']}:{ev['actor']}:{n}")
+                texts = cfg['joined_texts'] if ev['type'] == 'join' else cfg['left_texts']
+                job['template'] = rng.choice(texts)
+
+        else:
+            continue
+
+        yield job
+        now += datetime.timedelta(seconds=ev['duration'])
+        idx += 1
+
+def gif_overlays(layouts, cfg):
+    """
+    Rectangles, in frame coordinates, of the animated GIFs in a block laid
+    out as `layouts` (see animation.py).
+    """
+    L = cfg['layout']
+    top = L['message']['y'] + sum(len(m['wrapped']) for m in layouts) * L['message']['line_height']
+    overlays = []
+    for m in layouts:
+        for box in m['attachments']:
+            if box['type'] == 'gif' and box['ok'] and animation.is_animated(box['path']):
+                overlays.append({'path': box['path'], 'x': L['attachment']['x'], 'y': top + box['y'],
+                                 'w': box['w'], 'h': box['h']})
+        top += m['att_h']
+    return overlays
+
+def dirty_box(prev, job, cfg):
+    """
+    The part of `job`'s frame that differs from the frame of `prev`, the job
+    before it, as [x0, y0, x1, y1] in frame coordinates, or None when the
+    two frames are identical.  Only a message appended to the previous
+    block leaves part of the frame unchanged; otherwise the box is the
+    whole frame.  Rows below the previous frame are always inside the box.
+    """
+    L = cfg['layout']
+    w = L['world_width']
+    height = job['layout']['height']
+    whole = [0, 0, w, height]
+    if prev is None or (prev['type'], prev['actor']) != (job['type'], job['actor']):
+        return whole
+    if job['type'] != 'message':
+        # join, leave and typing frames show only their actor and text
+        return None if prev.get('template') == job.get('template') else whole
+
+    lines, prev_lines = job['lines'], prev['lines']
+    appended = (not job['edited'] and len(lines) == len(prev_lines) + 1
+                and all(a is b for a, b in zip(lines, prev_lines)))
+    if not appended:
+        return whole
+    M = L['message']
+    prev_msgs = prev['layout']['messages']
+    text_end = M['y'] + sum(len(m['wrapped']) for m in prev_msgs) * M['line_height']
+    if job['layout']['messages'][-1]['wrapped']:
+        # new text pushes the attachments down; accents and mention
+        # backgrounds reach a little above their line
+        top = text_end - M['line_height'] // 2
+    else:
+        top = text_end + sum(m['att_h'] for m in prev_msgs)
+    stamp = '%-I:%M %p'
+    if prev['edited'] or prev['now'].strftime(stamp) != job['now'].strftime(stamp):
+        top = L['name']['pos'][1]  # the timestamp line changes too
+    return [0, max(0, top), w, height]
+
+def layout_frames(cfg, jobs, fonts):
+    """
+    Yield `jobs` with job['layout'] filled in: the layout of every message
+    in the block (carried over from the previous frame for messages it
+    already showed), the frame height, the frame's place on the video
+    canvas (see compile_images.frame_geometry), any animated GIF overlays
+    and the box that changed since the previous frame (see dirty_box).
+    With video_settings.fixed_canvas the frame is the video canvas itself
+    (see place_on_canvas).
+    """
+    L = cfg['layout']
+    w = L['world_width']
+    fixed = cfg.get('video_settings', {}).get('fixed_canvas', False)
+    prev_lines, prev_layouts = [], []
+    prev = None
+
+    for job in jobs:
+        if job['type'] == 'message':
+            layouts = [prev_layouts[i] if i < len(prev_lines) and prev_lines[i] is msg
+                       else layout_message(msg, cfg, fonts)
+                       for i, msg in enumerate(job['lines'])]
+            prev_lines, prev_layouts = job['lines'], layouts
+            height = block_height(sum(len(m['wrapped']) for m in layouts),
+                                  sum(m['att_h'] for m in layouts), cfg, fonts)
+            layout = {'messages': layouts, 'height': height, 'overlays': gif_overlays(layouts, cfg)}
+        else:
+            prev_lines, prev_layouts = [], []
+            height = L['left' if job['type'] == 'leave' else 'joined']['height']
+            layout = {'height': height}
+        layout['frame'] = frame_geometry(w, height, w, scroll=fixed)
+        job['layout'] = layout
+        layout['dirty'] = dirty_box(prev, job, cfg)
+        if fixed:
+            place_on_canvas(layout, w)
+        prev = job
+        yield job
+
+def place_on_canvas(layout, w):
+    """
+    Turn a frame's layout into that of the w×w video canvas it is drawn
+    on: the block's place moves to layout['canvas'] (scrolled to its
+    bottom when taller than the canvas), the frame becomes the whole
+    canvas and the GIF overlays and dirty box move with the block.
+    """
+    x, y = layout['frame']['offset']
+    layout['canvas'] = layout['frame']
+    layout['frame'] = frame_geometry(w, w, w)
+    layout['height'] = w
+    for ov in layout.get('overlays', []):
+        ov['x'] += x
+        ov['y'] += y
+    # every change of a block changes its height, which moves the block
+    # on the canvas, so only unchanged frames keep part of the previous one
+    if layout['dirty'] is not None:
+        layout['dirty'] = [0, 0, w, w]
+
+def plan_layout(cfg, convo, fonts=None):
+    """
+    plan_frames with every job's layout worked out (see layout_frames).
+    """
+    return layout_frames(cfg, plan_frames(cfg, convo), fonts or init_fonts(cfg))
+
+def write_layout(cfg, convo, path):
+    """
+    Write the layout plan to `path` as JSON Lines, one frame per line,
+    without rendering anything.
+    """
+    with open(path, 'w', encoding='utf8') as f:
+        for job in plan_layout(cfg, convo):
+            f.write(json.dumps(job, ensure_ascii=False, default=str) + "\n")
+
+# ——— Frame cache ——————————————————————————————————————————————————
+#
+# With cfg['paths']['frame_cache'] set, every rendered frame is stored as
+# <key>.png, where the key hashes everything that affects its pixels.
+# Re-runs copy unchanged frames from the cache instead of redrawing them.
+
+# Bump when rendering code changes so stale frames are not reused
+FRAME_CACHE_VERSION = 4
+
+_DIGESTS = {}
 
-            img = render_block(current_actor, current_lines, cfg, fonts, profpics, colors, badges, now)
-            img.save(os.path.join(out, f"{idx:03d}.png"))
-            now += datetime.timedelta(seconds=ev['duration'])
-            idx += 1
+def file_digest(path):
+    """
+    SHA-1 of a file's contents, memoized per (path, mtime, size).
+    Missing files hash to their path so the key still changes when they appear.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return f"missing:{path}"
+    key = (os.path.abspath(path), st.st_mtime, st.st_size)
+    if key not in _DIGESTS:
+        h = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        _DIGESTS[key] = h.hexdigest()
+    return _DIGESTS[key]
+
+def frame_key(job, cfg, chars):
+    """
+    Content hash of everything that determines the pixels of `job`'s frame.
+    """
+    L = cfg['layout']
+    fonts = {k: (spec, file_digest(os.path.join(cfg['paths']['fonts_dir'], spec['file'])))
+             for k, spec in L['fonts'].items()}
+    char = chars.get(job['actor'], {})
+    parts = {
+        'version': FRAME_CACHE_VERSION,
+        'type': job['type'],
+        'actor': job['actor'],
+        'character': char,
+        'fonts': fonts,
+        'layout': {k: L.get(k) for k in ('world_width', 'world_color', 'profpic')},
+    }
+
+    if job.get('layout', {}).get('canvas'):
+        parts['canvas'] = job['layout']['canvas']
+
+    if job['type'] == 'message':
+        parts['layout'].update({k: L.get(k) for k in ('name', 'time', 'message', 'badge', 'attachment')})
+        parts['lines'] = job['lines']
+        parts['edited'] = job['edited']
+        parts['emoji_dir'] = cfg['paths'].get('emoji_dir')
+        parts['time'] = job['now'].strftime('%-I:%M %p')
+        parts['profpic'] = file_digest(os.path.join(cfg['paths']['profile_pics'], char.get('profile_pic', '')))
+        if char.get('badge'):
+            parts['badge'] = file_digest(os.path.join(cfg['paths']['badges_dir'], char['badge']))
+        parts['attachments'] = [file_digest(att['path'])
+                                for msg in job['lines'] for att in msg.get('attachments', [])
+                                if 'path' in att]
+    else:
+        parts['layout']['joined'] = L.get('joined')
+        if job['type'] == 'join':
+            parts['template'] = job['template']
+            parts['arrow'] = file_digest(cfg['paths']['green_arrow'])
+        elif job['type'] == 'leave':
+            parts['layout']['left'] = L.get('left')
+            parts['template'] = job['template']
+            parts['arrow'] = file_digest(cfg['paths']['red_arrow'])
+
+    blob = json.dumps(parts, sort_keys=True, default=str).encode('utf8')
+    return hashlib.sha1(blob).hexdigest()
+
+def tag_cached(jobs, cfg, chars, stats):
+    """
+    Yield `jobs`, tagging each with its frame cache path ('cached') and
+    whether that file already exists ('hit').  Hits and misses are counted
+    in `stats`.  Without a frame cache configured jobs pass through as is.
+    """
+    cache_dir = cfg['paths'].get('frame_cache')
+    if not cache_dir:
+        yield from jobs
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    for job in jobs:
+        job['cached'] = os.path.join(cache_dir, f"{frame_key(job, cfg, chars)}.png")
+        job['hit'] = os.path.isfile(job['cached'])
+        stats['hits' if job['hit'] else 'misses'] += 1
+        yield job
+
+def report_cache(stats):
+    if stats['hits'] or stats['misses']:
+        print(f"Frame cache: {stats['hits']} hits, {stats['misses']} misses")
+
+def load_cast(cfg, chars):
+    """
+    Resolve per-character profile picture paths, badge paths and role colors.
+    """
+    profpics = {n: os.path.join(cfg['paths']['profile_pics'], c['profile_pic']) for n,c in chars.items()}
+    badges = {n: os.path.join(cfg['paths']['badges_dir'], c['badge']) if c['badge'] else None for n, c in chars.items()}
+    colors   = {n: rgb(c['role_color']) for n,c in chars.items()}
+    return profpics, badges, colors
+
+def render_frame(job, cfg, fonts, profpics, colors, badges, state=None):
+    """
+    Render a single planned frame and return the PIL image.
+    When a `state` dict is passed, message blocks are rendered incrementally
+    on top of the block left in it by the previous call.  Frames planned
+    on the fixed video canvas (see place_on_canvas) come back as the
+    whole canvas.
+    """
+    img = render_event(job, cfg, fonts, profpics, colors, badges, state)
+    canvas = job.get('layout', {}).get('canvas')
+    if canvas:
+        img = fit_frame(img, cfg['layout']['world_width'], canvas)
+    return img
+
+def render_event(job, cfg, fonts, profpics, colors, badges, state=None):
+    global EDITED_FLAG
+    ev = {'actor': job['actor']}
 
+    if job['type'] == 'message':
+        EDITED_FLAG = job['edited']
+        layouts = job.get('layout', {}).get('messages')
+        try:
+            if state is not None:
+                return render_block_incremental(state, job['actor'], job['lines'], cfg, fonts, profpics, colors, badges, job['now'], layouts)
+            return render_block(job['actor'], job['lines'], cfg, fonts, profpics, colors, badges, job['now'], layouts)
+        finally:
             EDITED_FLAG = False
+    elif job['type'] == 'join':
+        return render_join(ev, cfg, fonts, colors, job['now'], job['template'])
+    elif job['type'] == 'leave':
+        return render_leave(ev, cfg, fonts, colors, job['now'], job['template'])
+    else:
+        return render_typing(ev, cfg, fonts, colors, job['now'])
 
-        elif ev['type'] == 'join':
-            current_actor = None
-            current_lines = []
-            img = render_join(ev, cfg, fonts, colors, now)
-            img.save(os.path.join(out, f"{idx:03d}.png"))
-            now += datetime.timedelta(seconds=ev['duration'])
-            idx += 1
+# ——— Frame deltas ——————————————————————————————————————————————————
+#
+# Within a block most of a frame repeats the previous one.  With deltas on,
+# such frames are written as NNN.tile.png, holding only their dirty box,
+# plus NNN.delta.json with the box and the frame size; unchanged frames get
+# just the JSON.  compile_images rebuilds them from the last full NNN.png.
 
-        elif ev['type'] == 'leave':
-            current_actor = None
-            current_lines = []
-            img = render_leave(ev, cfg, fonts, colors, now)
-            img.save(os.path.join(out, f"{idx:03d}.png"))
-            now += datetime.timedelta(seconds=ev['duration'])
-            idx += 1
+def tag_deltas(jobs, cfg, stats):
+    """
+    Yield `jobs`, marking with 'delta' the frames to be written as their
+    dirty box only: rendered (not copied from the frame cache), without
+    animated GIFs and not shrunk to fit the video canvas.  Delta frames
+    identical to the previous one are never rendered, so they leave the
+    frame cache and its miss count in `stats` (see tag_cached).
+    """
+    w = cfg['layout']['world_width']
+    for job in jobs:
+        layout = job['layout']
+        whole = [0, 0, w, layout['height']]
+        job['delta'] = (not job.get('hit') and not layout.get('overlays')
+                        and layout['frame']['size'][0] == w
+                        and layout['dirty'] != whole)
+        if job['delta'] and layout['dirty'] is None and 'cached' in job:
+            del job['cached'], job['hit']
+            stats['misses'] -= 1
+        yield job
 
-        elif ev['type'] == 'typing':
-            current_actor = None
-            current_lines = []
-            img = render_typing(ev, cfg, fonts, colors, now)
-            img.save(os.path.join(out, f"{idx:03d}.png"))
-            now += datetime.timedelta(seconds=ev['duration'])
-            idx += 1
+def _remove(*paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+def save_frame(job, img, path):
+    """
+    Write the frame to `path` (NNN.png), or for jobs tagged 'delta' its
+    dirty box to NNN.tile.png and NNN.delta.json.  Files of the other kind
+    left by an earlier run are removed.  `img` may be None for a delta
+    frame identical to the previous one.
+    """
+    stem = path[:-len('.png')]
+    tile, sidecar = f"{stem}.tile.png", f"{stem}.delta.json"
+    if not job.get('delta'):
+        img.save(path)
+        _remove(tile, sidecar)
+        return
+    box = job['layout']['dirty']
+    if box is None:
+        _remove(tile)
+    else:
+        img.crop(box).save(tile)
+    # the size drawn, before the -2 rounding of frame_geometry
+    size = [job['layout']['frame']['size'][0], job['layout']['height']]
+    with open(sidecar, 'w', encoding='utf8') as f:
+        json.dump({'box': box, 'size': size}, f)
+    _remove(path)
 
+def verify_deltas(cfg, convo, chars):
+    """
+    Check every frame's dirty box pixel for pixel: rebuild the frame at
+    its planned size from the previous frame plus its dirty box, as
+    compile_images does for frames written as tiles, and compare it with
+    a full render.  Returns the indices of the frames that differ.
+    """
+    fonts = init_fonts(cfg)
+    profpics, badges, colors = load_cast(cfg, chars)
+    bad = []
+    prev = None
+    n = 0
+    for job in plan_layout(cfg, convo, fonts):
+        img = render_frame(job, cfg, fonts, profpics, colors, badges)
+        layout = job['layout']
+        box = layout['dirty']
+        size = (layout['frame']['size'][0], layout['height'])
+        if prev is not None and box != [0, 0, *size]:
+            composed = Image.new(img.mode, size)
+            composed.paste(prev, (0, 0))
+            if box is not None:
+                composed.paste(img.crop(box), tuple(box[:2]))
+            # compare RGB: getbbox() on RGBA only looks at the alpha channel
+            if (composed.size != img.size
+                    or ImageChops.difference(composed.convert('RGB'), img.convert('RGB')).getbbox()):
+                bad.append(job['idx'])
+        prev = img
+        n += 1
+    if bad:
+        print(f"❌ {len(bad)} of {n} frames differ from their full render: "
+              + ", ".join(f"{i:03d}" for i in bad))
+    else:
+        print(f"✅ Dirty boxes match full renders on all {n} frames")
+    return bad
+
+# ——— Parallel workers ——————————————————————————————————————————————————
+
+# Per-process render state, filled once by _init_worker
+_WORKER = {}
+
+def _init_worker(cfg, chars, profile=False):
+    if profile:
+        profiling.enable()
+    _WORKER['cfg'] = cfg
+    _WORKER['fonts'] = init_fonts(cfg)
+    _WORKER['cast'] = load_cast(cfg, chars)
+    _WORKER['state'] = {}
+
+def _render_image(job):
+    if job.get('hit'):
+        img = Image.open(job['cached'])
+        img.load()
+        return img
+    profpics, badges, colors = _WORKER['cast']
+    return render_frame(job, _WORKER['cfg'], _WORKER['fonts'], profpics, colors, badges, _WORKER['state'])
+
+def _render_job(job):
+    """
+    Render and save one frame (or copy it from the frame cache).  Returns a
+    profiling record when profiling is enabled and the frame was rendered,
+    else None.
+    """
+    path = os.path.join(_WORKER['cfg']['paths']['chat_output'], f"{job['idx']:03d}.png")
+    if job.get('hit'):
+        shutil.copyfile(job['cached'], path)
+        stem = path[:-len('.png')]
+        _remove(f"{stem}.tile.png", f"{stem}.delta.json")
+        return None
+
+    record = None
+    img = None
+    start = time.perf_counter()
+    # a delta frame identical to the previous one needs no pixels at all
+    if not (job.get('delta') and job['layout']['dirty'] is None):
+        img = _render_image(job)
+    rendered = time.perf_counter()
+    save_frame(job, img, path)
+    if profiling.ENABLED:
+        block = _WORKER['state'].get('block') if job['type'] == 'message' else None
+        record = {
+            'idx': job['idx'],
+            'type': job['type'],
+            'actor': job['actor'],
+            'lines': len(block['wrapped']) if block else 0,
+            'attachments': sum(len(m.get('attachments') or []) for m in job.get('lines', [])),
+            'render_s': rendered - start,
+            'save_s': time.perf_counter() - rendered,
+            'start': start,
+            'pid': os.getpid(),
+        }
+
+    if 'cached' in job:
+        tmp = f"{job['cached']}.{os.getpid()}.tmp"
+        if job.get('delta'):
+            img.save(tmp, format='PNG')
+        else:
+            shutil.copyfile(path, tmp)
+        os.replace(tmp, job['cached'])
+    return record
+
+def _run_chunk(fn, jobs):
+    return [fn(job) for job in jobs]
+
+# Consecutive jobs sent to a worker at once; keeping a block's frames
+# together lets the worker render them incrementally
+RENDER_CHUNK = 8
+
+def map_jobs(fn, jobs, cfg, chars, workers=1):
+    """
+    Yield (job, fn(job)) for the `jobs` iterable, in order.
+    With `workers` > 1 chunks of consecutive jobs run on a process pool,
+    with only a few chunks in flight so memory stays bounded however long
+    the conversation is.
+    """
+    if workers <= 1:
+        _init_worker(cfg, chars, profiling.ENABLED)
+        for job in jobs:
+            yield job, fn(job)
+        return
+
+    jobs = iter(jobs)
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_init_worker,
+                             initargs=(cfg, chars, profiling.ENABLED)) as pool:
+        pending = deque()
+        while True:
+            part = list(islice(jobs, RENDER_CHUNK))
+            if part:
+                pending.append((part, pool.submit(_run_chunk, fn, part)))
+            while pending and (len(pending) >= workers * 2 or not part):
+                done, fut = pending.popleft()
+                yield from zip(done, fut.result())
+            if not part:
+                return
+
+def write_overlays(job, out_dir):
+    """
+    Write the frame's animated GIF overlays next to its PNG as
+    NNN.overlays.json for compile_images (or remove a stale one).
+    """
+    path = os.path.join(out_dir, f"{job['idx']:03d}.overlays.json")
+    overlays = job.get('layout', {}).get('overlays')
+    if overlays:
+        with open(path, 'w', encoding='utf8') as f:
+            json.dump(overlays, f)
+    elif os.path.exists(path):
+        os.remove(path)
+
+# ——— Main with cumulative logic —————————————————————————————————————————
+
+def plan_jobs(cfg, convo, chars, stats, deltas=False):
+    """
+    The frame jobs save_images hands to _render_job: laid out, tagged
+    with the frame cache (counted in `stats`) and, with `deltas`, with
+    the frames to write as dirty boxes.
+    """
+    if deltas and cfg.get('video_settings', {}).get('fade_transitions', False):
+        print("ℹ️  Fade transitions encode full frames in one pass, writing every frame in full")
+        deltas = False
+    jobs = tag_cached(plan_layout(cfg, convo), cfg, chars, stats)
+    if deltas:
+        jobs = tag_deltas(jobs, cfg, stats)
+    return jobs
+
+def save_images(cfg, convo, chars, workers=1, deltas=False):
+    """
+    Render every event to `chat_output/NNN.png`.
+    With `workers` > 1 the planned frames are rendered on a process pool;
+    the files written are identical to the serial path.  Frames found in
+    the frame cache are copied instead of rendered.  With `deltas`, frames
+    that repeat most of the previous one are written as their dirty box
+    only (see tag_deltas).  Events are consumed as a stream, so `convo`
+    may be a lazy Conversation.
+    """
+    out = cfg['paths']['chat_output']
+    os.makedirs(out, exist_ok=True)
+
+    stats = {'hits': 0, 'misses': 0}
+    jobs = plan_jobs(cfg, convo, chars, stats, deltas)
+    for job, record in map_jobs(_render_job, jobs, cfg, chars, workers):
+        write_overlays(job, out)
+        if record:
+            profiling.record_frames([record])
+    report_cache(stats)
+
+def iter_frames(cfg, convo, chars, workers=1, save_dir=None):
+    """
+    Yield (job, image) for every planned frame, in order, without touching
+    the disk unless `save_dir` is given (then NNN.png files are also written).
+    Cached frames are loaded from the frame cache; the rest are rendered
+    (see map_jobs) and added to it.
+    """
+    if save_dir:
+        os.makedirs(save_dir, exist_ok=True)
+
+    stats = {'hits': 0, 'misses': 0}
+    jobs = tag_cached(plan_layout(cfg, convo), cfg, chars, stats)
+    for job, img in map_jobs(_render_image, jobs, cfg, chars, workers):
+        if 'cached' in job and not job['hit']:
+            # like _render_job: concurrent runs may share the cache
+            tmp = f"{job['cached']}.{os.getpid()}.tmp"
+            img.save(tmp, format='PNG')
+            os.replace(tmp, job['cached'])
+        if save_dir:
+            img.save(os.path.join(save_dir, f"{job['idx']:03d}.png"))
+            write_overlays(job, save_dir)
+        yield job, img
+    report_cache(stats)
 
 if __name__ == '__main__':
     import argparse
@@ -615,10 +1406,22 @@ if __name__ == '__main__':
     parser.add_argument('config', help='Path to config.json')
     parser.add_argument('conversation', help='Path to conversation.json')
     parser.add_argument('characters', help='Path to characters.json')
+    parser.add_argument('--workers', type=int, default=1, help='Number of render processes')
+    parser.add_argument('--layout', metavar='PATH', help='Write the layout plan to PATH and exit')
+    parser.add_argument('--deltas', action='store_true',
+                        help='Write frames that repeat most of the previous one as tiles of their changed area')
+    parser.add_argument('--verify-deltas', action='store_true',
+                        help='Check the dirty boxes against full renders and exit')
     args = parser.parse_args()
 
     cfg   = load_json(args.config)
-    convo = load_json(args.conversation)
+    convo = load_conversation(args.conversation)
     chars = load_json(args.characters)
 
-    save_images(cfg, convo, chars)
+    if args.layout:
+        write_layout(cfg, convo, args.layout)
+    elif args.verify_deltas:
+        if verify_deltas(cfg, convo, chars):
+            raise SystemExit(1)
+    else:
+        save_images(cfg, convo, chars, workers=args.workers, deltas=args.deltas)
@@ -0,0 +1,46 @@
+# scripts/pipeline.py
+#
+# Render, encode and mix at the same time instead of one after another.
+# Frames go to ffmpeg as soon as they are rendered (compile_images.stream_video,
+# fed by generate_chat.iter_frames through bounded queues), while another
+# process mixes the audio to a WAV, which depends only on the conversation and
+# the sound assets.  The final mux starts as soon as both are done, so wall
+# time approaches the slowest stage rather than the sum of all of them.
+
+import os, tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from scripts import profiling
+    from scripts.generate_chat import iter_frames
+    from scripts.compile_images import stream_video
+    from scripts.sound_effects import render_audio, mux_audio
+except ImportError:  # run directly from scripts/
+    import profiling
+    from generate_chat import iter_frames
+    from compile_images import stream_video
+    from sound_effects import render_audio, mux_audio
+
+def run_pipeline(cfg, convo, chars, workers=1, audio_backend='numpy', save_dir=None):
+    """
+    Produce cfg['paths']['final_video'] with rendering, encoding and audio
+    mixing overlapped.  `audio_backend` is 'numpy' or 'ffmpeg'; `save_dir`
+    also keeps the NNN.png frames, as with --keep-frames.
+    """
+    silent = cfg['paths']['ffmpeg_output']
+    final = cfg['paths']['final_video']
+    out_dir = os.path.dirname(final) or '.'
+    os.makedirs(out_dir, exist_ok=True)
+    fd, wav_path = tempfile.mkstemp(suffix='.wav', dir=out_dir)
+    os.close(fd)
+    try:
+        with ProcessPoolExecutor(max_workers=1) as audio:
+            mixed = audio.submit(render_audio, cfg, convo, wav_path, audio_backend)
+            with profiling.stage('render+compile'):
+                stream_video(cfg, iter_frames(cfg, convo, chars, workers=workers, save_dir=save_dir))
+            with profiling.stage('mix (wait)'):
+                length = mixed.result()
+        with profiling.stage('mux'):
+            mux_audio(silent, wav_path, final, length)
+    finally:
+        os.remove(wav_path)
@@ -0,0 +1,104 @@
+# scripts/profiling.py
+#
+# Opt-in timing for the pipeline.  Everything is a no-op until enable() is
+# called, so the instrumented code paths cost one flag check when off.
+
+import os, csv, json, time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ENABLED = False
+_stages = []
+_frames = []
+
+FRAME_FIELDS = ('idx', 'type', 'actor', 'lines', 'attachments', 'render_s', 'save_s', 'start', 'pid')
+
+def enable():
+    global ENABLED
+    ENABLED = True
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process and of its finished children
+    (ffmpeg, moviepy readers), in MiB.  None where unsupported.
+    """
+    if resource is None:
+        return None
+    scale = 1 if os.uname().sysname == 'Darwin' else 1024  # bytes on macOS, KiB elsewhere
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    kids = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    return round(max(own, kids) / 2**20, 1)
+
+def _cpu():
+    t = os.times()
+    return t.user + t.system, t.children_user + t.children_system
+
+@contextmanager
+def stage(name):
+    """
+    Record wall time, CPU time (own and subprocesses) and peak RSS of the
+    enclosed block as pipeline stage `name`.
+    """
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    cpu, child_cpu = _cpu()
+    try:
+        yield
+    finally:
+        cpu_end, child_end = _cpu()
+        _stages.append({
+            'name': name,
+            'start': start,
+            'wall_s': time.perf_counter() - start,
+            'cpu_s': cpu_end - cpu,
+            'child_cpu_s': child_end - child_cpu,
+            'peak_rss_mb': peak_rss_mb(),
+        })
+
+def record_frames(records):
+    """
+    Add per-frame records (dicts with FRAME_FIELDS) produced by the renderer,
+    possibly in worker processes.
+    """
+    if ENABLED:
+        _frames.extend(r for r in records if r)
+
+def write(out_dir):
+    """
+    Write profile.json (stages + frames), frames.csv and trace.json, the
+    latter loadable in chrome://tracing or Perfetto.
+    """
+    if not ENABLED:
+        return
+    os.makedirs(out_dir, exist_ok=True)
+    origin = min([s['start'] for s in _stages] + [f['start'] for f in _frames], default=0.0)
+    main_pid = os.getpid()
+
+    with open(os.path.join(out_dir, 'profile.json'), 'w', encoding='utf8') as f:
+        json.dump({'stages': _stages, 'frames': _frames}, f, indent=2)
+
+    with open(os.path.join(out_dir, 'frames.csv'), 'w', encoding='utf8', newline='') as f:
+        w = csv.DictWriter(f, fieldnames=FRAME_FIELDS)
+        w.writeheader()
+        w.writerows(_frames)
+
+    us = lambda t: round((t - origin) * 1e6)
+    events = [{'name': s['name'], 'cat': 'stage', 'ph': 'X', 'pid': main_pid, 'tid': 0,
+               'ts': us(s['start']), 'dur': round(s['wall_s'] * 1e6),
+               'args': {k: s[k] for k in ('cpu_s', 'child_cpu_s', 'peak_rss_mb')}}
+              for s in _stages]
+    for fr in _frames:
+        events.append({'name': f"{fr['idx']:03d} {fr['type']}", 'cat': 'frame', 'ph': 'X',
+                       'pid': main_pid, 'tid': fr['pid'], 'ts': us(fr['start']),
+                       'dur': round((fr['render_s'] + fr['save_s']) * 1e6),
+                       'args': {k: fr[k] for k in ('actor', 'lines', 'attachments', 'render_s', 'save_s')}})
+    with open(os.path.join(out_dir, 'trace.json'), 'w', encoding='utf8') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    print(f"Profile written to {out_dir}")
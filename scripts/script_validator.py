@@ -1,21 +1,98 @@
 # scripts/script_validator.py
 
-import os, sys, json, argparse
+import os, sys, json, argparse, time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from scripts.conversation import load_conversation
+except ImportError:  # run directly as scripts/script_validator.py
+    from conversation import load_conversation
 
 def load_config(path):
     with open(path, encoding='utf8') as f:
         return json.load(f)
 
-def validate(convo, config):
+# ——— Asset index ———————————————————————————————————————————————————
+# Every event names files in the same few directories, so list each directory
+# once and answer "does this file exist?" from memory instead of one stat per
+# event (which adds up quickly on network-mounted asset volumes).
+
+_DIR_INDEX = {}
+
+def dir_index(path):
+    """Names of the files directly inside `path`, listed once per run."""
+    key = os.path.abspath(path)
+    names = _DIR_INDEX.get(key)
+    if names is None:
+        try:
+            with os.scandir(key) as it:
+                names = frozenset(e.name for e in it if e.is_file())
+        except OSError:
+            names = frozenset()
+        _DIR_INDEX[key] = names
+    return names
+
+def asset_exists(path, check=os.path.isfile):
+    """
+    `check(path)`, answered from the directory listing when `path` is in it.
+    Names missing from the listing (other case on a case-insensitive
+    volume, directories, files added since) fall back to `check`, which
+    only costs a stat for assets that are usually errors anyway.
+    """
+    folder, name = os.path.split(os.path.abspath(path))
+    return name in dir_index(folder) or check(path)
+
+# ——— Attachment probing ————————————————————————————————————————————
+# path -> (width, height) of every image/gif attachment probed so far, or None
+# when it failed to decode.  The renderer reads sizes from here instead of
+# opening each file again to lay out the attachment strip.
+
+ATTACHMENT_SIZES = {}
+
+def probe_image(path):
+    from PIL import Image  # only probing decodes images; plain validation stays light
+    try:
+        with Image.open(path) as img:
+            img.load()
+            return img.size
+    except Exception:
+        return None
+
+def probe_attachments(paths, workers=1):
+    """Decode every not-yet-probed image in `paths`, `workers` at a time."""
+    todo = [p for p in dict.fromkeys(paths) if p not in ATTACHMENT_SIZES]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for path, size in zip(todo, pool.map(probe_image, todo)):
+            ATTACHMENT_SIZES[path] = size
+    return ATTACHMENT_SIZES
+
+def reset_caches():
+    """
+    Forget directory listings and attachment sizes, so a long-lived process
+    (batch.py) sees assets added or replaced since its previous job.
+    """
+    _DIR_INDEX.clear()
+    ATTACHMENT_SIZES.clear()
+
+def validate(convo, config, probe=False, workers=1):
+    """
+    Check every event and return the list of errors (warnings are printed).
+    With probe=True, image and gif attachments are also decoded (on `workers`
+    threads) and their sizes recorded in ATTACHMENT_SIZES.
+    """
+    t0 = time.perf_counter()
     errors = []
     warnings = []
     codes = set(config['sound_codes'])
     sd = config['paths']['sound_dir']
+    images = []  # (event number, path) of image attachments to probe
+    count = 0
     
     valid_types = ('join', 'leave', 'message', 'typing')
     valid_attachment_types = ('image', 'gif', 'text', 'file')
     
     for idx, ev in enumerate(convo, 1):
+        count = idx
         # Validate event type
         if ev.get('type') not in valid_types:
             errors.append(f"#{idx}: bad type '{ev.get('type')}', valid types: {valid_types}")
@@ -62,25 +139,38 @@ def validate(convo, config):
                         errors.append(f"#{idx}: attachment {att_idx+1} has invalid type '{att.get('type')}'")
                     if 'path' not in att:
                         errors.append(f"#{idx}: attachment {att_idx+1} missing path")
-                    elif not os.path.exists(att['path']):
+                    elif not asset_exists(att['path'], os.path.exists):
                         errors.append(f"#{idx}: attachment file not found: {att['path']}")
+                    elif att.get('type') in ('image', 'gif'):
+                        images.append((idx, att['path']))
             
             # Validate background music if present
             if 'background_music' in ev:
                 bg_file = os.path.join(sd, f"{ev['background_music']}.mp3")
-                if not os.path.isfile(bg_file):
+                if not asset_exists(bg_file):
                     errors.append(f"#{idx}: background music file not found: {bg_file}")
         
         # Validate sound file exists
         sound_file = os.path.join(sd, f"{ev['sound']}.mp3")
-        if not os.path.isfile(sound_file):
+        if not asset_exists(sound_file):
             errors.append(f"#{idx}: sound file not found {sound_file}")
+
+    if probe and images:
+        sizes = probe_attachments([path for _, path in images], workers)
+        for idx, path in images:
+            if sizes[path] is None:
+                errors.append(f"#{idx}: attachment could not be decoded: {path}")
     
     # Print warnings
     if warnings:
         print("Warnings:")
         for w in warnings:
             print(f" - {w}")
+
+    took = time.perf_counter() - t0
+    probed = f", {len(images)} attachments probed" if probe else ""
+    print(f"⏱️ Validated {count} events in {took:.2f}s{probed}: "
+          f"{len(errors)} errors, {len(warnings)} warnings")
     
     return errors
 
@@ -88,12 +178,15 @@ def main():
     p = argparse.ArgumentParser()
     p.add_argument('config')
     p.add_argument('conversation')
+    p.add_argument('--probe', action='store_true',
+                   help='decode image attachments and record their sizes')
+    p.add_argument('--workers', type=int, default=4,
+                   help='threads used by --probe')
     args = p.parse_args()
 
     cfg = load_config(args.config)
-    with open(args.conversation, encoding='utf8') as f:
-        convo = json.load(f)
-    errs = validate(convo, cfg)
+    errs = validate(load_conversation(args.conversation), cfg,
+                    probe=args.probe, workers=args.workers)
     if errs:
         print("Errors:")
         for e in errs: print(" -", e)
@@ -1,101 +1,403 @@
 # scripts/sound_effects.py
 
 #!/usr/bin/env python3
-import os, json, argparse
-from moviepy.editor import VideoFileClip, AudioFileClip, CompositeAudioClip, concatenate_audioclips, afx
+# numpy and moviepy are imported inside the functions that use them, so the
+# ffmpeg backend and callers that only build the timeline never load them
+import os, json, argparse, subprocess, tempfile, hashlib, wave
+
+try:
+    from scripts.conversation import load_conversation
+except ImportError:  # run directly as scripts/sound_effects.py
+    from conversation import load_conversation
+
+# Gains applied to the two kinds of looped audio
+MUSIC_VOLUME = 0.3
+THEME_VOLUME = 0.15
+
+# Format every sound is decoded to
+SAMPLE_RATE = 44100
+CHANNELS = 2
+
+# Level above which the numpy mixer starts compressing peaks
+LIMIT_THRESHOLD = 0.9
+
+# The silent video holds its last frame this much longer than the events
+FINAL_FRAME = 0.04
 
 def load_config(path):
     with open(path, encoding='utf8') as f:
         return json.load(f)
 
+# Sounds that start the next background theme
+THEME_TRIGGERS = {"explosion", "scream", "panic", "modeugene", "oh-my-god-bro-oh-hell-nah-man"}
+
 def find_theme_change_indices(convo):
     # Change themes based on key moments or pacing.
     # Naively, every 5-7 messages or every "explosion", "scream", "panic", etc.
     theme_events = []
     current_theme = 0
     for i, event in enumerate(convo):
-        if event.get("sound") in {"explosion", "scream", "panic", "modeugene", "oh-my-god-bro-oh-hell-nah-man"}:
+        if event.get("sound") in THEME_TRIGGERS:
             theme_events.append((i, current_theme))
             current_theme += 1
     return theme_events
 
-def add_sounds_and_themes(cfg, convo, silent_video_path, final_video_path):
-    video = VideoFileClip(silent_video_path)
-    event_clips = []
-    theme_clips = []
+# ——— Sound bank ————————————————————————————————————————————————————
+#
+# Each sound file is decoded at most once per run into a float32 array of
+# shape (samples, CHANNELS); every event that plays it shares that array.
+# With cfg['paths']['sound_cache'] set, decoded arrays are also stored as
+# .npy files keyed by the mp3's content hash.
+
+_SOUNDS = {}
+
+def _file_hash(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def decode_sound(path):
+    """
+    Decode `path` with ffmpeg into float32 PCM at SAMPLE_RATE/CHANNELS.
+    """
+    import numpy as np
+    cmd = ['ffmpeg', '-v', 'error', '-i', path,
+           '-f', 'f32le', '-ac', str(CHANNELS), '-ar', str(SAMPLE_RATE), '-']
+    raw = subprocess.run(cmd, check=True, capture_output=True).stdout
+    return np.frombuffer(raw, dtype=np.float32).reshape(-1, CHANNELS)
 
+def load_sound(path, cache_dir=None):
+    """
+    Return the shared decoded PCM array for `path`; do not modify it.
+    """
+    import numpy as np
+    key = os.path.abspath(path)
+    if key in _SOUNDS:
+        return _SOUNDS[key]
+
+    cache_file = None
+    if cache_dir:
+        cache_file = os.path.join(cache_dir, f"{_file_hash(path)}-{SAMPLE_RATE}-{CHANNELS}.npy")
+
+    if cache_file and os.path.isfile(cache_file):
+        pcm = np.load(cache_file, mmap_mode='r')
+    else:
+        pcm = decode_sound(path)
+        if cache_file:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp = f"{cache_file}.{os.getpid()}.tmp.npy"
+            np.save(tmp, pcm)
+            os.replace(tmp, cache_file)
+
+    _SOUNDS[key] = pcm
+    return pcm
+
+def build_audio_timeline(cfg, convo):
+    """
+    Turn the conversation into a list of audio placements shared by every
+    mixing backend, in a single pass over the events.  Each placement is a
+    dict with:
+      kind     - 'effect', 'music' (per-message background) or 'theme'
+      path     - mp3 file to play
+      start    - offset in seconds on the video timeline
+      duration - seconds to fill by looping/trimming, or None to play once
+      volume   - gain applied to the clip
+    """
     sound_dir = cfg['paths']['sound_dir']
     theme_dir = cfg['paths']['theme_dir']  # Assuming theme tracks also reside here
     themes = cfg.get('theme_codes', [])
+    placements = []
+    theme_points = []  # (event index, theme index, start time), as find_theme_change_indices
     total_duration = 0.0
+    count = 0
 
     # Add sound effect clips and individual background music
-    for event in convo:
+    for i, event in enumerate(convo):
         dur = float(event['duration'])
-        
+        count = i + 1
+
+        if event.get('sound') in THEME_TRIGGERS:
+            theme_points.append((i, len(theme_points), total_duration))
+
         # Add sound effects
         sound_name = event.get('sound')
         if sound_name:
             sound_path = os.path.join(sound_dir, f"{sound_name}.mp3")
             if os.path.isfile(sound_path):
-                event_clips.append(AudioFileClip(sound_path).set_start(total_duration))
-        
+                placements.append({'kind': 'effect', 'path': sound_path, 'start': total_duration,
+                                   'duration': None, 'volume': 1.0})
+
         # Add individual background music for messages
         if event.get('type') == 'message' and 'background_music' in event:
-            bg_music_name = event['background_music']
-            bg_music_path = os.path.join(sound_dir, f"{bg_music_name}.mp3")
+            bg_music_path = os.path.join(sound_dir, f"{event['background_music']}.mp3")
             if os.path.isfile(bg_music_path):
-                bg_clip = AudioFileClip(bg_music_path)
-                # Loop or trim to match message duration
-                if bg_clip.duration < dur:
-                    bg_clip = afx.audio_loop(bg_clip, duration=dur)
-                else:
-                    bg_clip = bg_clip.subclip(0, dur)
-                # Lower volume for background music
-                bg_clip = bg_clip.volumex(0.3)
-                theme_clips.append(bg_clip.set_start(total_duration))
-        
+                placements.append({'kind': 'music', 'path': bg_music_path, 'start': total_duration,
+                                   'duration': dur, 'volume': MUSIC_VOLUME})
+
         total_duration += dur
 
     # Add background themes
-    theme_points = find_theme_change_indices(convo)
     if not theme_points:
-        theme_points = [(0, 0)]  # fallback
+        theme_points = [(0, 0, 0.0)]  # fallback
 
     # Calculate theme segments
-    theme_points.append((len(convo), len(themes)-1))  # mark end
+    theme_points.append((count, len(themes)-1, total_duration))  # mark end
     timeline = 0.0
-    for (start_idx, theme_idx), (end_idx, _) in zip(theme_points, theme_points[1:]):
+    for (_, theme_idx, start_t), (_, _, end_t) in zip(theme_points, theme_points[1:]):
         if theme_idx >= len(themes):
             break
-        segment_duration = sum(float(convo[i]['duration']) for i in range(start_idx, end_idx))
+        segment_duration = end_t - start_t
         theme_file = os.path.join(theme_dir, f"{themes[theme_idx]}.mp3")
         if os.path.isfile(theme_file):
-            theme_clip = AudioFileClip(theme_file)
-            theme_clip = afx.audio_loop(theme_clip, duration=segment_duration).volumex(0.15)
-            theme_clips.append(theme_clip.set_start(timeline))
+            placements.append({'kind': 'theme', 'path': theme_file, 'start': timeline,
+                               'duration': segment_duration, 'volume': THEME_VOLUME})
         timeline += segment_duration
 
+    return placements
+
+def add_sounds_and_themes(cfg, convo, silent_video_path, final_video_path, backend='moviepy'):
+    """
+    Mix the conversation's audio into the silent video.
+    `backend` is 'moviepy' (composite + re-encode), 'ffmpeg' (single
+    filter graph) or 'numpy' (in-process mix to WAV); the last two copy
+    the video stream untouched.
+    """
+    placements = build_audio_timeline(cfg, convo)
+    length = sum(float(ev['duration']) for ev in convo) + FINAL_FRAME
+    if backend == 'ffmpeg':
+        mix_with_ffmpeg(placements, silent_video_path, final_video_path, length)
+    elif backend == 'numpy':
+        mix_with_numpy(placements, length, silent_video_path, final_video_path,
+                       cache_dir=cfg['paths'].get('sound_cache'))
+    else:
+        mix_with_moviepy(placements, silent_video_path, final_video_path,
+                         cache_dir=cfg['paths'].get('sound_cache'))
+
+def mix_with_moviepy(placements, silent_video_path, final_video_path, cache_dir=None):
+    from moviepy.editor import VideoFileClip, CompositeAudioClip, afx
+    from moviepy.audio.AudioClip import AudioArrayClip
+
+    video = VideoFileClip(silent_video_path)
+    event_clips = []
+    theme_clips = []
+
+    # one in-memory clip per file, shared by every event that plays it
+    sources = {}
+    for p in placements:
+        if p['path'] not in sources:
+            sources[p['path']] = AudioArrayClip(load_sound(p['path'], cache_dir), fps=SAMPLE_RATE)
+        clip = sources[p['path']]
+        if p['kind'] == 'effect':
+            event_clips.append(clip.set_start(p['start']))
+            continue
+        dur = p['duration']
+        if p['kind'] == 'music':
+            # Loop or trim to match message duration
+            if clip.duration < dur:
+                clip = afx.audio_loop(clip, duration=dur)
+            else:
+                clip = clip.subclip(0, dur)
+        else:
+            clip = afx.audio_loop(clip, duration=dur)
+        theme_clips.append(clip.volumex(p['volume']).set_start(p['start']))
+
     # Mix all clips together
     all_audio = event_clips + theme_clips
     if all_audio:
         video = video.set_audio(CompositeAudioClip(all_audio))
 
+    # temp audio beside the output, so concurrent runs never share it
+    temp_audio = os.path.join(os.path.dirname(os.path.abspath(final_video_path)),
+                              f"{os.path.splitext(os.path.basename(final_video_path))[0]}-temp-audio.m4a")
     video.write_videofile(final_video_path, codec='libx264', audio_codec='aac',
-                          temp_audiofile='temp-audio.m4a', remove_temp=True)
+                          temp_audiofile=temp_audio, remove_temp=True)
     video.close()
 
+def build_filter_graph(placements, length=None):
+    """
+    Build the ffmpeg inputs and filter_complex graph for `placements`.
+    Input 0 is the video; each distinct (path, looped) pair is opened once
+    and fanned out with asplit.  With `length` the mix is padded/trimmed to
+    exactly that many seconds.  Returns (input_args, graph, has_audio).
+    """
+    sources = {}
+    for p in placements:
+        sources.setdefault((p['path'], p['duration'] is not None), []).append(p)
+
+    input_args = []
+    chains = []
+    labels = []
+    for n, ((path, looped), uses) in enumerate(sources.items(), 1):
+        if looped:
+            input_args += ['-stream_loop', '-1']
+        input_args += ['-i', path]
+
+        outs = [f"s{n}_{k}" for k in range(len(uses))]
+        if len(uses) > 1:
+            chains.append(f"[{n}:a]asplit={len(uses)}" + "".join(f"[{o}]" for o in outs))
+        else:
+            outs = [f"{n}:a"]
+
+        for label, p in zip(outs, uses):
+            steps = []
+            if p['duration'] is not None:
+                steps.append(f"atrim=0:{p['duration']:.6f},asetpts=PTS-STARTPTS")
+            if p['volume'] != 1.0:
+                steps.append(f"volume={p['volume']}")
+            steps.append(f"adelay={round(p['start'] * 1000)}:all=1")
+            out = f"m{len(labels)}"
+            chains.append(f"[{label}]" + ",".join(steps) + f"[{out}]")
+            labels.append(out)
+
+    if not labels:
+        return input_args, "", False
+
+    # normalize=0 sums the inputs like moviepy's CompositeAudioClip instead of averaging;
+    # a finite pad/trim to the video's length lets ffmpeg end cleanly (an endless
+    # apad relying on -shortest fails with ENOSPC on ffmpeg 7)
+    tail = f"apad=whole_dur={length:.6f},atrim=0:{length:.6f}" if length else "apad"
+    chains.append("".join(f"[{l}]" for l in labels)
+                  + f"amix=inputs={len(labels)}:duration=longest:dropout_transition=0:normalize=0,{tail}[aout]")
+    return input_args, ";\n".join(chains), True
+
+def mix_with_ffmpeg(placements, silent_video_path, final_video_path, length=None):
+    input_args, graph, has_audio = build_filter_graph(placements, length)
+    if not has_audio:
+        subprocess.run(['ffmpeg', '-y', '-i', silent_video_path, '-c', 'copy', final_video_path], check=True)
+        return
+
+    # graphs for long scripts exceed the command-line limit, so pass them as a file
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False, encoding='utf8') as f:
+        f.write(graph)
+        graph_file = f.name
+    try:
+        cmd = ['ffmpeg', '-y', '-i', silent_video_path, *input_args,
+               '-filter_complex_script', graph_file,
+               '-map', '0:v', '-map', '[aout]',
+               '-c:v', 'copy', '-c:a', 'aac', '-shortest', final_video_path]
+        subprocess.run(cmd, check=True)
+    finally:
+        os.remove(graph_file)
+
+def soft_clip(buf, threshold=LIMIT_THRESHOLD):
+    """
+    Compress samples above `threshold` smoothly towards ±1, in place.
+    """
+    import numpy as np
+    over = np.abs(buf) > threshold
+    if over.any():
+        x = buf[over]
+        knee = 1.0 - threshold
+        buf[over] = np.sign(x) * (threshold + knee * np.tanh((np.abs(x) - threshold) / knee))
+    return buf
+
+def mix_timeline(placements, length, cache_dir=None):
+    """
+    Mix `placements` into one float32 (samples, CHANNELS) buffer `length`
+    seconds long.  Each clip is slice-added at its start sample; looped
+    placements are tiled to their duration.  Work is proportional to the
+    audio written, not to the number of clips.
+    """
+    import numpy as np
+    n = int(round(length * SAMPLE_RATE))
+    buf = np.zeros((n, CHANNELS), dtype=np.float32)
+
+    for p in placements:
+        pcm = load_sound(p['path'], cache_dir)
+        start = int(round(p['start'] * SAMPLE_RATE))
+        if start >= n or not len(pcm):
+            continue
+        if p['duration'] is None:
+            want = min(len(pcm), n - start)
+        else:
+            want = min(int(round(p['duration'] * SAMPLE_RATE)), n - start)
+
+        gain = np.float32(p['volume'])
+        for off in range(0, want, len(pcm)):
+            k = min(len(pcm), want - off)
+            buf[start + off:start + off + k] += pcm[:k] * gain
+
+    return soft_clip(buf)
+
+def write_wav(path, buf):
+    """
+    Write a float buffer in [-1, 1] as 16-bit PCM WAV.
+    """
+    import numpy as np
+    pcm = (np.clip(buf, -1.0, 1.0) * 32767).astype('<i2')
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(CHANNELS)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes(pcm.tobytes())
+
+def mix_with_numpy(placements, length, silent_video_path, final_video_path, cache_dir=None):
+    out_dir = os.path.dirname(final_video_path) or '.'
+    os.makedirs(out_dir, exist_ok=True)
+    fd, wav_path = tempfile.mkstemp(suffix='.wav', dir=out_dir)
+    os.close(fd)
+    try:
+        write_wav(wav_path, mix_timeline(placements, length, cache_dir))
+        mux_audio(silent_video_path, wav_path, final_video_path, length)
+    finally:
+        os.remove(wav_path)
+
+def render_audio(cfg, convo, audio_path, backend='numpy'):
+    """
+    Mix the conversation's audio on its own into the WAV file `audio_path`.
+    Needs only the conversation and the sound assets, so it can run while
+    the video is still being rendered.  `backend` is 'numpy' or 'ffmpeg'.
+    Returns the length in seconds (the silent video's length).
+    """
+    placements = build_audio_timeline(cfg, convo)
+    length = sum(float(ev['duration']) for ev in convo) + FINAL_FRAME
+    if backend != 'ffmpeg':
+        write_wav(audio_path, mix_timeline(placements, length, cfg['paths'].get('sound_cache')))
+        return length
+
+    input_args, graph, has_audio = build_filter_graph(placements, length)
+    # silence stands in for the video as input 0, so the graph's input numbers hold
+    silence = ['-f', 'lavfi', '-t', f"{length:.6f}", '-i', f"anullsrc=r={SAMPLE_RATE}:cl=stereo"]
+    if not has_audio:
+        subprocess.run(['ffmpeg', '-y', *silence, '-c:a', 'pcm_s16le', audio_path], check=True)
+        return length
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False, encoding='utf8') as f:
+        f.write(graph)
+        graph_file = f.name
+    try:
+        cmd = ['ffmpeg', '-y', *silence, *input_args,
+               '-filter_complex_script', graph_file,
+               '-map', '[aout]', '-c:a', 'pcm_s16le', audio_path]
+        subprocess.run(cmd, check=True)
+    finally:
+        os.remove(graph_file)
+    return length
+
+def mux_audio(video_path, audio_path, final_video_path, length):
+    """
+    Copy the video stream of `video_path` and encode `audio_path` next to it,
+    padded with silence to `length` seconds.  The pad is finite: an endless
+    apad relying on -shortest never finishes on ffmpeg 7.
+    """
+    cmd = ['ffmpeg', '-y', '-i', video_path, '-i', audio_path,
+           '-map', '0:v', '-map', '1:a', '-c:v', 'copy', '-c:a', 'aac',
+           '-af', f"apad=whole_dur={length:.6f}", '-shortest', final_video_path]
+    subprocess.run(cmd, check=True)
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--config',       default='utils/config.json')
     parser.add_argument('--conversation', default='utils/conversation.json')
     parser.add_argument('--input-video',  default=None)
     parser.add_argument('--output-video', default=None)
+    parser.add_argument('--backend',      choices=('moviepy', 'ffmpeg', 'numpy'), default='moviepy',
+                        help="'ffmpeg' and 'numpy' mix without re-encoding the video stream")
     args = parser.parse_args()
 
     cfg = load_config(args.config)
-    with open(args.conversation, encoding='utf8') as f:
-        convo = json.load(f)
+    convo = load_conversation(args.conversation)
 
     input_video = args.input_video or cfg['paths']['intermediate_video']
     output_video = args.output_video or cfg['paths']['final_video']
@@ -104,7 +406,7 @@ def main():
         print(f"Error: missing {input_video}")
         return
 
-    add_sounds_and_themes(cfg, convo, input_video, output_video)
+    add_sounds_and_themes(cfg, convo, input_video, output_video, backend=args.backend)
 
 if __name__ == '__main__':
     main()
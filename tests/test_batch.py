@@ -0,0 +1,89 @@
+# tests/test_batch.py
+#
+# End-to-end check that a batch job, whose chat_output is nested under its
+# own output directory, renders and compiles through the default one-pass
+# concat encode (needs ffmpeg on PATH), and that the --queue directory picks
+# up job files again once the previous file of that name has finished.
+
+import os, sys, json, shutil, tempfile, unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import batch
+
+CONVERSATION = [
+    {"type": "join", "actor": "Pizza", "duration": 0.5, "sound": "join"},
+    {"type": "message", "actor": "Pizza", "text": "hello **batch**", "duration": 0.5, "sound": "message"},
+    {"type": "message", "actor": "Pizza", "text": "second line", "duration": 0.5, "sound": "message"},
+]
+
+@unittest.skipUnless(shutil.which('ffmpeg'), "ffmpeg is not installed")
+class BatchJobTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        os.chdir(ROOT)  # config paths are relative to the repository
+        self.tmp = tempfile.mkdtemp(prefix='batch-test-')
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_nested_chat_output_compiles(self):
+        convo = os.path.join(self.tmp, 'convo.json')
+        with open(convo, 'w', encoding='utf8') as f:
+            json.dump(CONVERSATION, f)
+        # relative output root, like the default output/batch
+        output_root = os.path.relpath(os.path.join(self.tmp, 'out'), ROOT)
+        jobs = batch.name_jobs([{'config': 'utils/config.json', 'conversation': convo,
+                                 'characters': 'utils/characters.json'}], output_root)
+
+        status = batch.run_job(jobs[0], threads=1, audio_backend='numpy')
+
+        self.assertEqual(status['status'], 'ok', status.get('traceback') or status.get('errors'))
+        self.assertTrue(os.path.getsize(status['video']) > 0)
+        self.assertEqual(list(status['stages']), ['validate', 'render', 'compile', 'mix'])
+
+class QueueTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='queue-test-')
+        self.queue = os.path.join(self.tmp, 'queue')
+        os.makedirs(self.queue)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def drop(self, name, job):
+        with open(os.path.join(self.queue, name), 'w', encoding='utf8') as f:
+            json.dump(job, f)
+
+    def test_requeued_file_with_the_same_name_runs_again(self):
+        job = {'config': 'utils/config.json', 'conversation': 'convo.json',
+               'characters': 'utils/characters.json'}
+        taken = set()
+        self.drop('render.json', job)
+        jobs, rejected = batch.queue_jobs(self.queue, self.tmp, taken)
+        self.assertEqual([j['name'] for j in jobs], ['render'])
+        # still running: not queued twice
+        self.assertEqual(batch.queue_jobs(self.queue, self.tmp, taken), ([], []))
+
+        batch.finish_queue_file({'name': 'render', 'job': jobs[0], 'status': 'ok'}, taken)
+        self.assertTrue(os.path.isfile(os.path.join(self.queue, 'done', 'render.json')))
+        self.drop('render.json', job)
+        jobs, rejected = batch.queue_jobs(self.queue, self.tmp, taken)
+        self.assertEqual([j['name'] for j in jobs], ['render'])
+
+    def test_requeued_file_after_a_rejected_one_runs(self):
+        taken = set()
+        self.drop('render.json', ['not', 'a', 'job'])
+        jobs, rejected = batch.queue_jobs(self.queue, self.tmp, taken)
+        self.assertEqual((jobs, [r['status'] for r in rejected]), ([], ['failed']))
+        self.assertTrue(os.path.isfile(os.path.join(self.queue, 'failed', 'render.json')))
+
+        self.drop('render.json', {'config': 'utils/config.json', 'conversation': 'convo.json',
+                                  'characters': 'utils/characters.json'})
+        jobs, rejected = batch.queue_jobs(self.queue, self.tmp, taken)
+        self.assertEqual(([j['name'] for j in jobs], rejected), (['render'], []))
+
+if __name__ == '__main__':
+    unittest.main()
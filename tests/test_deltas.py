@@ -0,0 +1,69 @@
+# tests/test_deltas.py
+#
+# --verify-deltas must catch a dirty box that misses what changed.
+
+import os, sys, json, shutil, tempfile, unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import main
+from scripts import generate_chat
+from scripts.script_validator import load_config
+
+CONVERSATION = [
+    {"type": "message", "actor": "Pizza", "text": "first line", "duration": 0.5, "sound": "message"},
+    {"type": "message", "actor": "Pizza", "text": "second line", "duration": 0.5, "sound": "message"},
+    {"type": "message", "actor": "Pizza", "text": "third line", "duration": 0.5, "sound": "message"},
+]
+
+real_dirty_box = generate_chat.dirty_box
+
+def new_rows_only(prev, job, cfg):
+    """
+    A wrong dirty box: only the rows the block grew by, missing the changes
+    above them, where both frames are opaque and differ in colour alone.
+    """
+    box = real_dirty_box(prev, job, cfg)
+    if box is None or box[1] == 0:
+        return box
+    return [box[0], prev['layout']['height'], box[2], box[3]]
+
+class VerifyDeltasTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        os.chdir(ROOT)  # config paths are relative to the repository
+        self.tmp = tempfile.mkdtemp(prefix='deltas-test-')
+        self.cfg = load_config('utils/config.json')
+        with open('utils/characters.json', encoding='utf8') as f:
+            self.chars = json.load(f)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_true_dirty_boxes_pass(self):
+        self.assertEqual(generate_chat.verify_deltas(self.cfg, CONVERSATION, self.chars), [])
+
+    def test_wrong_dirty_box_is_reported(self):
+        with mock.patch.object(generate_chat, 'dirty_box', new_rows_only):
+            bad = generate_chat.verify_deltas(self.cfg, CONVERSATION, self.chars)
+        self.assertEqual(bad, [2, 3])
+
+    def test_wrong_dirty_box_exits_with_error(self):
+        paths = {}
+        for name, data in (('config', self.cfg), ('convo', CONVERSATION)):
+            paths[name] = os.path.join(self.tmp, f'{name}.json')
+            with open(paths[name], 'w', encoding='utf8') as f:
+                json.dump(data, f)
+        argv = ['main.py', '--config', paths['config'], '--conversation', paths['convo'],
+                '--verify-deltas', '--stage', 'render']
+        with mock.patch.object(generate_chat, 'dirty_box', new_rows_only), \
+             mock.patch.object(sys, 'argv', argv):
+            with self.assertRaises(SystemExit) as exit:
+                main.main()
+        self.assertEqual(exit.exception.code, 1)
+
+if __name__ == '__main__':
+    unittest.main()